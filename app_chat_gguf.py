@@ -1,12 +1,25 @@
 import os
+import uuid
 import streamlit as st
 
-from modules.multi_rag_gguf import (
-    build_vector_store_from_folder_gguf,
-    answer_question_multi_pdf_gguf,
-)
+from modules.multi_rag_gguf import build_vector_store_from_folder_gguf
+from modules.chat_gguf import answer_chat_turn_gguf, reset_chat_session
+from modules.mmap_store import MmapVectorStore, has_published_index
+from modules.resource_manager import resource_manager
 
 DATA_FOLDER = r"C:\local_ai\data"
+# Index published with `python modules/mmap_store.py`; shared by all app processes if present
+SHARED_INDEX_DIR = r"C:\local_ai\index"
+
+# Unload models / index that sit idle, keep the total under MEMORY_BUDGET_BYTES
+resource_manager.start()
+
+
+@st.cache_resource
+def open_shared_index(root: str) -> MmapVectorStore:
+    # One instance per process: all sessions share the mappings (and one resource-manager entry)
+    return MmapVectorStore(root)
+
 
 st.set_page_config(
     page_title="🦙 Local LLaMA PDF Chat",
@@ -37,7 +50,9 @@ with st.sidebar:
     st.markdown("---")
     if st.button("🔁 Rebuild index (all PDFs)"):
         # Force rebuild next time main area runs
-        for key in ["gguf_store", "messages"]:
+        if "chat_id" in st.session_state:
+            reset_chat_session(st.session_state.chat_id)
+        for key in ["gguf_store", "messages", "chat_id"]:
             if key in st.session_state:
                 del st.session_state[key]
         st.success("Index will be rebuilt from PDFs on next message.")
@@ -65,7 +80,10 @@ st.caption("Chat with **all PDFs in `/data`** using a fully local LLaMA model. N
 
 # Session state: vector store + chat history
 if "gguf_store" not in st.session_state:
-    if not os.path.exists(DATA_FOLDER):
+    if has_published_index(SHARED_INDEX_DIR):
+        st.session_state.gguf_store = open_shared_index(SHARED_INDEX_DIR)
+        st.session_state.messages = []
+    elif not os.path.exists(DATA_FOLDER):
         st.error(f"Cannot build index – folder missing:\n`{DATA_FOLDER}`")
     elif not pdf_files:
         st.warning("Add some PDFs to `/data` first.")
@@ -80,6 +98,10 @@ if "gguf_store" not in st.session_state:
 if "messages" not in st.session_state:
     st.session_state.messages = []
 
+# One id per conversation: keys the saved LLaMA state so follow-ups only prefill new text
+if "chat_id" not in st.session_state:
+    st.session_state.chat_id = uuid.uuid4().hex
+
 # Render chat history
 for msg in st.session_state.messages:
     with st.chat_message("user" if msg["role"] == "user" else "assistant", avatar="🧑" if msg["role"] == "user" else "🦙"):
@@ -102,8 +124,9 @@ if user_input and user_input.strip():
         # 2) Get answer from RAG + LLaMA
         with st.chat_message("assistant", avatar="🦙"):
             with st.spinner("Thinking with your PDFs + LLaMA 3.1 8B..."):
-                answer = answer_question_multi_pdf_gguf(
+                answer = answer_chat_turn_gguf(
                     st.session_state.gguf_store,
+                    st.session_state.chat_id,
                     user_input,
                     top_k=5,
                 )
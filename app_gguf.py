@@ -5,8 +5,22 @@ from modules.multi_rag_gguf import (
     build_vector_store_from_folder_gguf,
     answer_question_multi_pdf_gguf,
 )
+from modules.mmap_store import MmapVectorStore, has_published_index
+from modules.resource_manager import resource_manager
 
 DATA_FOLDER = r"C:\local_ai\data"
+# Index published with `python modules/mmap_store.py`; shared by all app processes if present
+SHARED_INDEX_DIR = r"C:\local_ai\index"
+
+# Unload models / index that sit idle, keep the total under MEMORY_BUDGET_BYTES
+resource_manager.start()
+
+
+@st.cache_resource
+def open_shared_index(root: str) -> MmapVectorStore:
+    # One instance per process: all sessions share the mappings (and one resource-manager entry)
+    return MmapVectorStore(root)
+
 
 st.set_page_config(
     page_title="Local Multi-PDF Chat (GGUF LLaMA)",
@@ -21,7 +35,9 @@ st.caption("Ask questions across ALL PDFs in /data using a fully local LLaMA mod
 # Build vector store once
 # -------------------
 if "gguf_store" not in st.session_state:
-    if not os.path.exists(DATA_FOLDER):
+    if has_published_index(SHARED_INDEX_DIR):
+        st.session_state.gguf_store = open_shared_index(SHARED_INDEX_DIR)
+    elif not os.path.exists(DATA_FOLDER):
         st.error(f"Data folder not found: {DATA_FOLDER}")
     else:
         with st.spinner("Indexing ALL PDFs in /data into a vector store..."):
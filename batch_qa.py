@@ -0,0 +1,199 @@
+"""
+Offline batch question answering over the PDF index.
+
+Reads questions from JSONL ({"id": ..., "question": ...} per line), embeds and searches them
+in large batches, generates answers and appends one JSONL record per question with the
+answer, retrieved chunk ids, scores and per-stage timings. Re-running with the same output
+file resumes where an interrupted run stopped.
+
+Examples:
+    python batch_qa.py questions.jsonl answers.jsonl --data-folder C:\\local_ai\\data
+    python batch_qa.py questions.jsonl answers.jsonl --shared-index C:\\local_ai\\index --backend t5
+"""
+import os
+import json
+import time
+import argparse
+from typing import Dict, Iterator, List, Tuple
+
+from modules.embedder import embed_texts
+from modules.rag_context import format_context_text
+
+
+def read_questions(path: str) -> List[Dict[str, str]]:
+    questions = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line_no, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            record = json.loads(line)
+            if "question" not in record:
+                raise ValueError(f"{path}:{line_no} has no 'question' field")
+            record.setdefault("id", str(line_no))
+            questions.append(record)
+    return questions
+
+
+def read_done_ids(path: str) -> set:
+    """
+    Ids already answered in a previous (possibly interrupted) run.
+    """
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                done.add(str(json.loads(line)["id"]))
+            except (ValueError, KeyError):
+                continue  # half-written last line of an interrupted run
+    return done
+
+
+def load_store(args):
+    if args.shared_index:
+        from modules.mmap_store import MmapVectorStore
+
+        return MmapVectorStore(args.shared_index)
+    if args.index_dir:
+        from modules.vector_store import VectorStore
+
+        return VectorStore.load(args.index_dir)
+
+    # Import only the backend's own pipeline (each pulls in its model library)
+    if args.backend == "t5":
+        from modules.multi_rag import build_vector_store_from_folder
+    else:
+        from modules.multi_rag_gguf import build_vector_store_from_folder_gguf as build_vector_store_from_folder
+
+    store, _ = build_vector_store_from_folder(args.data_folder)
+    return store
+
+
+def generate_group(prompts: List[str], backend: str, batch_size: int) -> Iterator[Tuple[int, str, float]]:
+    """
+    Generate answers for one group of prompts, yielding (prompt_index, answer, generate_ms)
+    as soon as each answer (T5: each batch) is ready.
+    """
+    if backend == "t5":
+        from modules.local_llm import generate_answers
+
+        for batch_start in range(0, len(prompts), batch_size):
+            batch = prompts[batch_start:batch_start + batch_size]
+            start = time.perf_counter()
+            answers = generate_answers(batch, max_new_tokens=256, batch_size=batch_size, decoding="greedy")
+            per_prompt = (time.perf_counter() - start) * 1000 / len(batch)
+            for offset, answer in enumerate(answers):
+                yield batch_start + offset, answer, per_prompt
+        return
+
+    from modules.local_llm_gguf import generate_answer
+
+    for i, prompt in enumerate(prompts):
+        start = time.perf_counter()
+        answer = generate_answer(prompt, max_tokens=256)
+        yield i, answer, (time.perf_counter() - start) * 1000
+
+
+def get_prompt_formatter(backend: str):
+    if backend == "t5":
+        from modules.multi_rag import format_rag_prompt
+
+        return format_rag_prompt
+
+    from modules.multi_rag_gguf import format_rag_prompt_gguf
+
+    return format_rag_prompt_gguf
+
+
+def run_batch(args):
+    questions = read_questions(args.questions)
+    done = read_done_ids(args.output)
+    pending = [q for q in questions if str(q["id"]) not in done]
+    print(f"📋 {len(questions)} questions, {len(done)} already answered, {len(pending)} to go")
+    if not pending:
+        return
+
+    store = load_store(args)
+    format_prompt = get_prompt_formatter(args.backend)
+
+    # An interrupted run can leave a half-written last line: start on a fresh one
+    if os.path.exists(args.output) and os.path.getsize(args.output) > 0:
+        with open(args.output, "rb+") as f:
+            f.seek(-1, os.SEEK_END)
+            if f.read(1) != b"\n":
+                f.write(b"\n")
+
+    with open(args.output, "a", encoding="utf-8") as out:
+        for group_start in range(0, len(pending), args.group_size):
+            group = pending[group_start:group_start + args.group_size]
+            texts = [q["question"] for q in group]
+
+            # 1) Embed the whole group in one call
+            start = time.perf_counter()
+            q_embs = embed_texts(texts, batch_size=args.embed_batch_size)
+            embed_ms = (time.perf_counter() - start) * 1000 / len(group)
+
+            # 2) Search the whole group in one call
+            start = time.perf_counter()
+            scores, ids = store.search_batch(q_embs, top_k=args.top_k)
+            search_ms = (time.perf_counter() - start) * 1000 / len(group)
+
+            hits = []
+            for row_scores, row_ids in zip(scores, ids):
+                hits.append([(int(i), float(s)) for i, s in zip(row_ids, row_scores) if i != -1])
+
+            # 3) Order prompts so questions with the same retrieved chunks run back to back:
+            # llama.cpp then reuses the evaluated context prefix, T5 gets similar-length batches.
+            # Scores stay out of the context text (they differ per question and would break the shared prefix)
+            order = sorted(range(len(group)), key=lambda i: [chunk_id for chunk_id, _ in hits[i]])
+            prompts = [
+                format_prompt(
+                    group[i]["question"],
+                    format_context_text([(store.text_chunks[c], s) for c, s in hits[i]], include_scores=False),
+                )
+                for i in order
+            ]
+
+            # 4) Generate, checkpointing every answer as soon as it is ready
+            for p, answer, ms in generate_group(prompts, args.backend, args.gen_batch_size):
+                i = order[p]
+                record = {
+                    "id": group[i]["id"],
+                    "question": group[i]["question"],
+                    "answer": answer,
+                    "chunk_ids": [c for c, _ in hits[i]],
+                    "scores": [round(s, 4) for _, s in hits[i]],
+                    "timings_ms": {
+                        "embed": round(embed_ms, 2),
+                        "search": round(search_ms, 2),
+                        "generate": round(ms, 2),
+                    },
+                }
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                out.flush()
+                os.fsync(out.fileno())
+
+            done_count = len(done) + group_start + len(group)
+            print(f"✅ Answered {done_count}/{len(questions)} questions")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Batch question answering over local PDFs")
+    parser.add_argument("questions", help="input JSONL with a 'question' (and optional 'id') per line")
+    parser.add_argument("output", help="output JSONL; existing ids are skipped (resume)")
+    source = parser.add_mutually_exclusive_group()
+    source.add_argument("--data-folder", default=r"C:\local_ai\data", help="build the index from these PDFs")
+    source.add_argument("--index-dir", help="folder saved with VectorStore.save()")
+    source.add_argument("--shared-index", help="folder published with modules/mmap_store.py")
+    parser.add_argument("--backend", choices=["gguf", "t5"], default="gguf")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--group-size", type=int, default=256, help="questions embedded/searched/checkpointed together")
+    parser.add_argument("--embed-batch-size", type=int, default=64)
+    parser.add_argument("--gen-batch-size", type=int, default=8, help="T5 generation batch size")
+    run_batch(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,464 @@
+"""
+Concurrent-user load test for the GGUF RAG pipeline (answer_question_multi_pdf_gguf).
+
+Simulates N users, each in its own thread (like Streamlit sessions in one process):
+ask a question from the mix, wait for the answer, think, repeat. Reports throughput,
+p50/p95/p99 latency, time spent waiting for the shared LLM lock (queueing) and in the
+vector/BM25 search, how many calls overlapped inside the shared LLM, and CPU / memory over time.
+
+--models stub replaces the embedder and LLM singletons with fast fake models, so the
+locking and queueing of the pipeline can be tested offline (CI) without model files
+(llama_cpp / sentence_transformers need not be installed). --models real uses the actual models.
+
+Examples:
+    python load_test.py --users 8 --duration 60 --models stub
+    python load_test.py --users 4 --duration 300 --models real --data-folder C:\\local_ai\\data
+    python load_test.py --users 16 --questions mix.jsonl --think-time 2 --output report.json
+"""
+import io
+import os
+import sys
+import json
+import time
+import random
+import hashlib
+import argparse
+import threading
+import importlib.util
+import types
+from contextlib import nullcontext, redirect_stdout
+from typing import Dict, List, Optional
+
+import numpy as np
+
+# The model modules (embedder, local_llm_gguf, multi_rag_gguf) are imported inside the
+# functions, after _allow_missing_model_libs() had a chance to run for --models stub
+from modules.vector_store import VectorStore
+
+try:
+    import psutil
+except ImportError:
+    psutil = None  # memory is then read from /proc (Linux) or not reported
+
+DEFAULT_MIX = [
+    {"question": "What is the main topic across these documents?", "weight": 3},
+    {"question": "Summarize the key definitions mentioned in the documents.", "weight": 2},
+    {"question": "Which requirements or steps are listed?", "weight": 2},
+    {"question": "What does clause 4.2.1 say about warranty terms?", "weight": 1, "search_mode": "hybrid"},
+]
+
+
+# ---------------------------------------------------------------------------
+# Stub models (same call signatures as SentenceTransformer / llama_cpp.Llama)
+# ---------------------------------------------------------------------------
+
+class StubEmbedder:
+    """
+    Deterministic fake sentence embedder: hash-seeded vectors, `ms_per_text` of work per text.
+    """
+
+    def __init__(self, dim: int, ms_per_text: float = 2.0):
+        self.dim = dim
+        self.ms_per_text = ms_per_text
+
+    def encode(self, texts, batch_size=32, show_progress_bar=False, convert_to_numpy=True):
+        time.sleep(self.ms_per_text * len(texts) / 1000)
+        vectors = np.zeros((len(texts), self.dim), dtype="float32")
+        for i, text in enumerate(texts):
+            seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:4], "little")
+            vectors[i] = np.random.default_rng(seed).normal(size=self.dim)
+        return vectors
+
+
+class StubLlama:
+    """
+    Fake llama.cpp model: prompt processing and decoding cost a fixed time per token
+    (roughly 4 characters per token). Overlapping calls are not blocked, only counted by the harness.
+    """
+
+    def __init__(self, ms_per_prompt_token: float = 0.2, ms_per_token: float = 20.0, answer_tokens: int = 64):
+        self.ms_per_prompt_token = ms_per_prompt_token
+        self.ms_per_token = ms_per_token
+        self.answer_tokens = answer_tokens
+
+    def create_chat_completion(self, messages, max_tokens=256, temperature=0.7, **kwargs):
+        prompt_tokens = sum(len(m["content"]) for m in messages) // 4
+        completion_tokens = min(max_tokens, self.answer_tokens)
+        time.sleep((prompt_tokens * self.ms_per_prompt_token + completion_tokens * self.ms_per_token) / 1000)
+        return {
+            "choices": [{"message": {"role": "assistant", "content": "stub answer " * (completion_tokens // 2)}}],
+            "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens},
+        }
+
+
+# ---------------------------------------------------------------------------
+# Instrumentation
+# ---------------------------------------------------------------------------
+
+class _ModelTimer:
+    """
+    Wraps a model (or the store) and records, per thread, the time spent inside `method`, plus how many
+    calls were inside the model at the same time (more than 1 on the LLM means a race).
+    """
+
+    def __init__(self, model, method: str, local: threading.local, key: str):
+        self._model = model
+        self._method = method
+        self._local = local
+        self._key = key
+        self._lock = threading.Lock()
+        self.active = 0
+        self.max_active = 0
+
+    def __getattr__(self, name):
+        attr = getattr(self._model, name)
+        if name != self._method:
+            return attr
+
+        def timed(*args, **kwargs):
+            with self._lock:
+                self.active += 1
+                self.max_active = max(self.max_active, self.active)
+            start = time.perf_counter()
+            try:
+                return attr(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - start
+                setattr(self._local, self._key, getattr(self._local, self._key, 0.0) + elapsed)
+                with self._lock:
+                    self.active -= 1
+
+        return timed
+
+
+class _LockTimer:
+    """
+    Wraps local_llm_gguf._lock and records, per thread, the time spent waiting to acquire it:
+    the actual queueing of requests for the shared llama.cpp context.
+    """
+
+    def __init__(self, lock, local: threading.local, key: str):
+        self._lock = lock
+        self._local = local
+        self._key = key
+
+    def acquire(self, blocking: bool = True, timeout: float = -1) -> bool:
+        start = time.perf_counter()
+        acquired = self._lock.acquire(blocking, timeout)
+        elapsed = time.perf_counter() - start
+        setattr(self._local, self._key, getattr(self._local, self._key, 0.0) + elapsed)
+        return acquired
+
+    def release(self):
+        self._lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+def _rss_mb() -> Optional[float]:
+    if psutil is not None:
+        return psutil.Process().memory_info().rss / 1e6
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1e6
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+class ResourceSampler(threading.Thread):
+    """
+    Samples process CPU utilization, resident memory and in-flight requests every `interval` s.
+    CPU is in percent of one core (400% = four cores busy).
+    """
+
+    def __init__(self, interval: float, stats: "LoadStats"):
+        super().__init__(daemon=True)
+        self.interval = interval
+        self.stats = stats
+        self.samples: List[Dict[str, float]] = []
+        self._done = threading.Event()
+
+    def run(self):
+        start = last_wall = time.perf_counter()
+        last_cpu = time.process_time()
+        while not self._done.wait(self.interval):
+            wall, cpu = time.perf_counter(), time.process_time()
+            self.samples.append({
+                "t_s": round(wall - start, 2),
+                "cpu_pct": round(100.0 * (cpu - last_cpu) / max(wall - last_wall, 1e-9), 1),
+                "rss_mb": _rss_mb(),
+                "in_flight": self.stats.in_flight,
+                "completed": len(self.stats.latencies),
+            })
+            last_wall, last_cpu = wall, cpu
+
+    def stop(self):
+        self._done.set()
+        self.join()
+
+
+class LoadStats:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.latencies: List[float] = []
+        self.lock_waits: List[float] = []
+        self.search_times: List[float] = []
+        self.errors: List[str] = []
+
+
+# ---------------------------------------------------------------------------
+# Load generation
+# ---------------------------------------------------------------------------
+
+def read_mix(path: Optional[str]) -> List[Dict]:
+    """
+    Question mix from JSONL: {"question": ..., "weight": 1, "search_mode": "dense"} per line.
+    """
+    if not path:
+        return DEFAULT_MIX
+    mix = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                mix.append(json.loads(line))
+    if not mix:
+        raise ValueError(f"No questions in {path}")
+    return mix
+
+
+def _allow_missing_model_libs():
+    """
+    --models stub never calls into llama_cpp or sentence_transformers, but the pipeline
+    modules import them at load time. Register placeholder modules for the ones that are
+    not installed, so offline CI does not need the native wheels.
+    """
+    placeholders = {
+        "llama_cpp": {"Llama": StubLlama},
+        "llama_cpp.llama_speculative": {"LlamaDraftModel": object, "LlamaPromptLookupDecoding": object},
+        "sentence_transformers": {"SentenceTransformer": StubEmbedder},
+    }
+    missing = {name for name in ("llama_cpp", "sentence_transformers") if importlib.util.find_spec(name) is None}
+    for name, attrs in placeholders.items():
+        if name.split(".")[0] in missing:
+            module = types.ModuleType(name)
+            module.__dict__.update(attrs)
+            sys.modules[name] = module
+    if missing:
+        print(f"ℹ️ Not installed, using placeholders for --models stub: {', '.join(sorted(missing))}")
+
+
+def install_stub_models(embed_ms: float, token_ms: float, answer_tokens: int):
+    """
+    Put stub models into the embedder / GGUF singletons so the pipeline never loads real weights.
+    """
+    from modules import embedder, local_llm_gguf
+
+    stub = StubEmbedder(embedder.EMBEDDING_DIM, ms_per_text=embed_ms)
+    embedder._models[embedder._model_key(embedder.EMBEDDER_BACKEND)] = stub
+    local_llm_gguf._llm = StubLlama(ms_per_token=token_ms, answer_tokens=answer_tokens)
+
+
+def build_store(data_folder: Optional[str], num_chunks: int = 2000) -> VectorStore:
+    from modules.embedder import EMBEDDING_DIM, embed_texts
+
+    if data_folder and os.path.exists(data_folder):
+        from modules.multi_rag_gguf import build_vector_store_from_folder_gguf
+
+        store, _ = build_vector_store_from_folder_gguf(data_folder)
+        return store
+
+    # No PDFs (e.g. in CI): index synthetic chunks
+    rng = random.Random(0)
+    words = "pump valve filter warranty clause pressure safety inspection schedule part replace".split()
+    chunks = [f"Section {i}: " + " ".join(rng.choice(words) for _ in range(120)) for i in range(num_chunks)]
+    store = VectorStore(dim=EMBEDDING_DIM)
+    store.add_embeddings(embed_texts(chunks), chunks)
+    store.build_lexical_index()
+    return store
+
+
+def user_loop(user_id: int, store, mix: List[Dict], args, stats: LoadStats, deadline: float, local: threading.local):
+    from modules.multi_rag_gguf import answer_question_multi_pdf_gguf
+
+    rng = random.Random(args.seed + user_id)
+    weights = [item.get("weight", 1) for item in mix]
+    time.sleep(args.ramp_up * user_id / max(1, args.users))
+
+    requests_done = 0
+    while time.perf_counter() < deadline:
+        if args.requests_per_user and requests_done >= args.requests_per_user:
+            return
+        item = rng.choices(mix, weights=weights)[0]
+        local.embed_s = local.llm_s = local.lock_wait_s = local.search_s = 0.0
+
+        with stats.lock:
+            stats.in_flight += 1
+        start = time.perf_counter()
+        try:
+            answer_question_multi_pdf_gguf(
+                store, item["question"], top_k=args.top_k, search_mode=item.get("search_mode", "dense")
+            )
+            latency = time.perf_counter() - start
+            with stats.lock:
+                stats.latencies.append(latency)
+                stats.lock_waits.append(local.lock_wait_s)
+                stats.search_times.append(local.search_s)
+        except Exception as e:
+            with stats.lock:
+                stats.errors.append(repr(e))
+        finally:
+            with stats.lock:
+                stats.in_flight -= 1
+        requests_done += 1
+
+        if args.think_time > 0:
+            # Exponential think time: users don't all come back in lockstep
+            time.sleep(rng.expovariate(1.0 / args.think_time))
+
+
+def _percentiles(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {"p50_ms": 0.0, "p95_ms": 0.0, "p99_ms": 0.0, "mean_ms": 0.0}
+    ms = np.array(values) * 1000
+    return {
+        "p50_ms": round(float(np.percentile(ms, 50)), 1),
+        "p95_ms": round(float(np.percentile(ms, 95)), 1),
+        "p99_ms": round(float(np.percentile(ms, 99)), 1),
+        "mean_ms": round(float(ms.mean()), 1),
+    }
+
+
+def run_load_test(args) -> Dict:
+    if args.models == "stub":
+        _allow_missing_model_libs()
+    from modules import embedder, local_llm_gguf
+
+    if args.models == "stub":
+        install_stub_models(args.stub_embed_ms, args.stub_token_ms, args.stub_answer_tokens)
+
+    mix = read_mix(args.questions)
+    store = build_store(args.data_folder)
+
+    # Load (or pick up the stubs) before timing, then wrap the singletons to time calls into them
+    local = threading.local()
+    embed_timer = _ModelTimer(embedder.load_embedder(), "encode", local, "embed_s")
+    llm_timer = _ModelTimer(local_llm_gguf.load_llm(), "create_chat_completion", local, "llm_s")
+    embedder._models[embedder._model_key(embedder.EMBEDDER_BACKEND)] = embed_timer
+    local_llm_gguf._llm = llm_timer
+    # generate_answer() looks the lock up at call time, so the wrapper sees every wait for the LLM
+    local_llm_gguf._lock = _LockTimer(local_llm_gguf._lock, local, "lock_wait_s")
+    store = _ModelTimer(store, "search", local, "search_s")
+
+    stats = LoadStats()
+    sampler = ResourceSampler(args.sample_interval, stats)
+    rss_start = _rss_mb()
+
+    print(f"🚦 {args.users} users, {args.duration:.0f}s, think time {args.think_time}s, models={args.models}")
+    quiet = None if args.verbose else io.StringIO()
+    start = time.perf_counter()
+    deadline = start + args.duration
+    users = [
+        threading.Thread(target=user_loop, args=(u, store, mix, args, stats, deadline, local), daemon=True)
+        for u in range(args.users)
+    ]
+    sampler.start()
+    try:
+        # The pipeline prints a lot per question; keep the console for the report
+        with redirect_stdout(quiet) if quiet is not None else nullcontext():
+            for u in users:
+                u.start()
+            for u in users:
+                u.join()
+    finally:
+        sampler.stop()
+    elapsed = time.perf_counter() - start
+
+    cpu = [s["cpu_pct"] for s in sampler.samples]
+    rss = [s["rss_mb"] for s in sampler.samples if s["rss_mb"] is not None]
+    report = {
+        "users": args.users,
+        "models": args.models,
+        "seconds": round(elapsed, 1),
+        "requests": len(stats.latencies),
+        "errors": len(stats.errors),
+        "throughput_rps": round(len(stats.latencies) / elapsed, 3) if elapsed else 0.0,
+        "latency": _percentiles(stats.latencies),
+        "queueing": _percentiles(stats.lock_waits),
+        "search": _percentiles(stats.search_times),
+        "max_concurrent_llm_calls": llm_timer.max_active,
+        "max_concurrent_embed_calls": embed_timer.max_active,
+        "cpu_pct": {"mean": round(float(np.mean(cpu)), 1) if cpu else 0.0, "max": max(cpu, default=0.0)},
+        "rss_mb": {
+            "start": rss_start,
+            "end": rss[-1] if rss else None,
+            "max": max(rss) if rss else None,
+        },
+        "timeline": sampler.samples,
+        "error_samples": stats.errors[:10],
+    }
+    print_report(report)
+    return report
+
+
+def print_report(report: Dict):
+    lat, queue, search = report["latency"], report["queueing"], report["search"]
+    print(f"\n📊 Load test: {report['users']} users, {report['requests']} requests in {report['seconds']}s "
+          f"({report['errors']} errors)")
+    print(f"  - throughput : {report['throughput_rps']} req/s")
+    print(f"  - latency    : p50={lat['p50_ms']} ms  p95={lat['p95_ms']} ms  p99={lat['p99_ms']} ms")
+    print(f"  - queueing   : p50={queue['p50_ms']} ms  p95={queue['p95_ms']} ms  p99={queue['p99_ms']} ms "
+          "(waiting for the shared LLM lock)")
+    print(f"  - search     : p50={search['p50_ms']} ms  p95={search['p95_ms']} ms  p99={search['p99_ms']} ms")
+    print(f"  - overlap    : max {report['max_concurrent_llm_calls']} concurrent LLM calls, "
+          f"{report['max_concurrent_embed_calls']} concurrent embed calls")
+    if report["max_concurrent_llm_calls"] > 1:
+        print("  ⚠️ Several requests were inside the shared llama.cpp context at once (unsafe)")
+    print(f"  - CPU        : mean {report['cpu_pct']['mean']}%  max {report['cpu_pct']['max']}% (100% = one core)")
+    rss = report["rss_mb"]
+    if rss["start"] is not None and rss["end"] is not None:
+        print(f"  - memory     : {rss['start']:.0f} MB -> {rss['end']:.0f} MB (max {rss['max']:.0f} MB)")
+
+    timeline = report["timeline"]
+    step = max(1, len(timeline) // 10)
+    print("\n  t(s)   cpu%   rss(MB)  in-flight  done")
+    for s in timeline[::step]:
+        rss_text = f"{s['rss_mb']:8.0f}" if s["rss_mb"] is not None else "     n/a"
+        print(f"  {s['t_s']:5.1f}  {s['cpu_pct']:5.0f}  {rss_text}  {s['in_flight']:9d}  {s['completed']:4d}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent-user load test for the GGUF RAG pipeline")
+    parser.add_argument("--users", type=int, default=8, help="concurrent simulated users")
+    parser.add_argument("--duration", type=float, default=60.0, help="seconds to run")
+    parser.add_argument("--requests-per-user", type=int, default=0, help="stop each user after N requests (0 = no limit)")
+    parser.add_argument("--think-time", type=float, default=1.0, help="mean seconds between a user's questions")
+    parser.add_argument("--ramp-up", type=float, default=5.0, help="seconds over which users start")
+    parser.add_argument("--questions", help="JSONL question mix (question, weight, search_mode)")
+    parser.add_argument("--data-folder", default=r"C:\local_ai\data", help="PDFs to index (synthetic chunks if missing)")
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--models", choices=["stub", "real"], default="stub")
+    parser.add_argument("--stub-embed-ms", type=float, default=2.0, help="stub embedder time per text")
+    parser.add_argument("--stub-token-ms", type=float, default=20.0, help="stub LLM time per generated token")
+    parser.add_argument("--stub-answer-tokens", type=int, default=64)
+    parser.add_argument("--sample-interval", type=float, default=1.0, help="seconds between CPU/memory samples")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the full report (with timeline) as JSON")
+    parser.add_argument("--verbose", action="store_true", help="keep the pipeline's own log output")
+    args = parser.parse_args()
+
+    report = run_load_test(args)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Report written to {args.output}")
+    sys.exit(1 if report["errors"] else 0)
+
+
+if __name__ == "__main__":
+    main()
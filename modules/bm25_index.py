@@ -0,0 +1,177 @@
+import os
+import re
+import json
+import unicodedata
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Keeps part numbers / clause ids like "AB-1234.5" or "4.2.1" together as one token.
+# [^\W_] is any Unicode letter or digit, so "Müller" or "Straße" stay whole words
+TOKEN_RE = re.compile(r"[^\W_]+(?:[-_./:][^\W_]+)*")
+SPLIT_RE = re.compile(r"[-_./:]")
+BM25_ARRAYS = ("offsets", "post_docs", "post_tfs", "doc_len")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Case-folded Unicode word tokenizer (NFKC-normalized, so composed and decomposed
+    accents match). Compound tokens ("ab-1234.5") are kept whole and also split into
+    their parts, so both exact ids and pieces match.
+    """
+    tokens: List[str] = []
+    for tok in TOKEN_RE.findall(unicodedata.normalize("NFKC", text).casefold()):
+        tokens.append(tok)
+        if SPLIT_RE.search(tok):
+            tokens.extend(p for p in SPLIT_RE.split(tok) if p)
+    return tokens
+
+
+class BM25Index:
+    """
+    Compact in-process inverted index with BM25 scoring:
+    - add_documents() to index chunks (doc ids = insertion order, same as VectorStore)
+    - search() to get top-k (doc_id, score)
+    - save() / load() to persist next to the FAISS index
+
+    Postings are kept as flat numpy arrays (doc ids + term frequencies per term).
+    They are saved as .npy files, so load() memory-maps them instead of copying.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.vocab: Dict[str, int] = {}
+        self.offsets = np.zeros(1, dtype="int64")  # postings of term t: offsets[t]:offsets[t+1]
+        self.post_docs = np.zeros(0, dtype="int32")
+        self.post_tfs = np.zeros(0, dtype="float32")
+        self.doc_len = np.zeros(0, dtype="float32")
+        self.idf = np.zeros(0, dtype="float32")
+        self._pending: List[Counter] = []
+
+    @property
+    def num_docs(self) -> int:
+        return len(self.doc_len) + len(self._pending)
+
+    def add_documents(self, docs: List[str]):
+        self._pending.extend(Counter(tokenize(d)) for d in docs)
+
+    def _freeze(self):
+        """
+        Merge pending documents into the flat postings arrays.
+        """
+        if not self._pending:
+            return
+
+        postings: Dict[str, Tuple[List[int], List[float]]] = {}
+        for term, t in self.vocab.items():
+            start, end = self.offsets[t], self.offsets[t + 1]
+            postings[term] = (self.post_docs[start:end].tolist(), self.post_tfs[start:end].tolist())
+
+        first_id = len(self.doc_len)
+        new_lens = []
+        for i, counts in enumerate(self._pending, start=first_id):
+            new_lens.append(sum(counts.values()))
+            for term, tf in counts.items():
+                docs, tfs = postings.setdefault(term, ([], []))
+                docs.append(i)
+                tfs.append(tf)
+
+        self.vocab = {term: t for t, term in enumerate(postings)}
+        lengths = [len(docs) for docs, _ in postings.values()]
+        self.offsets = np.concatenate([[0], np.cumsum(lengths)]).astype("int64")
+        self.post_docs = np.fromiter(
+            (d for docs, _ in postings.values() for d in docs), dtype="int32", count=int(self.offsets[-1])
+        )
+        self.post_tfs = np.fromiter(
+            (tf for _, tfs in postings.values() for tf in tfs), dtype="float32", count=int(self.offsets[-1])
+        )
+        self.doc_len = np.concatenate([self.doc_len, np.asarray(new_lens, dtype="float32")])
+        self._pending = []
+        self._compute_idf()
+
+    def _compute_idf(self):
+        n = len(self.doc_len)
+        df = np.diff(self.offsets).astype("float32")
+        self.idf = np.log(1.0 + (n - df + 0.5) / (df + 0.5)).astype("float32")
+
+    def score(self, query: str) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        BM25 score of every document that contains at least one query term.
+        Returns (doc_ids, scores).
+        """
+        self._freeze()
+        term_ids = [self.vocab[t] for t in set(tokenize(query)) if t in self.vocab]
+        if not term_ids:
+            return np.zeros(0, dtype="int64"), np.zeros(0, dtype="float32")
+
+        avg_len = float(self.doc_len.mean()) or 1.0
+        scores = np.zeros(len(self.doc_len), dtype="float32")
+        for t in term_ids:
+            start, end = self.offsets[t], self.offsets[t + 1]
+            docs = self.post_docs[start:end]
+            tf = self.post_tfs[start:end]
+            norm = self.k1 * (1.0 - self.b + self.b * self.doc_len[docs] / avg_len)
+            scores[docs] += self.idf[t] * tf * (self.k1 + 1.0) / (tf + norm)
+
+        doc_ids = np.nonzero(scores)[0]
+        return doc_ids, scores[doc_ids]
+
+    def search(self, query: str, top_k: int = 5) -> List[Tuple[int, float]]:
+        """
+        returns: list of (doc_id, bm25_score), best first
+        """
+        doc_ids, scores = self.score(query)
+        if len(doc_ids) == 0:
+            return []
+
+        k = min(top_k, len(doc_ids))
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        return [(int(doc_ids[i]), float(scores[i])) for i in best]
+
+    def save(self, folder: str):
+        self._freeze()
+        os.makedirs(folder, exist_ok=True)
+        for name in BM25_ARRAYS:
+            if isinstance(getattr(self, name), np.memmap):
+                # Copy before overwriting the file it maps (Windows refuses to write mapped files)
+                setattr(self, name, np.array(getattr(self, name)))
+        for name in BM25_ARRAYS:
+            np.save(os.path.join(folder, f"bm25_{name}.npy"), getattr(self, name))
+        terms = sorted(self.vocab, key=self.vocab.get)
+        with open(os.path.join(folder, "bm25_vocab.json"), "w", encoding="utf-8") as f:
+            json.dump({"k1": self.k1, "b": self.b, "terms": terms}, f)
+
+    @classmethod
+    def load(cls, folder: str) -> Optional["BM25Index"]:
+        """
+        Load an index saved with save(); returns None if the folder has no BM25 files.
+        Postings are memory-mapped read-only, so processes opening the same folder share them.
+        """
+        vocab_path = os.path.join(folder, "bm25_vocab.json")
+        if not os.path.exists(vocab_path):
+            return None
+
+        with open(vocab_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        index = cls(k1=meta["k1"], b=meta["b"])
+        index.vocab = {term: t for t, term in enumerate(meta["terms"])}
+
+        for name in BM25_ARRAYS:
+            setattr(index, name, np.load(os.path.join(folder, f"bm25_{name}.npy"), mmap_mode="r"))
+        index._compute_idf()
+        return index
+
+
+if __name__ == "__main__":
+    docs = [
+        "Replace filter part AB-1234.5 every 6 months.",
+        "Clause 4.2.1 covers warranty terms.",
+        "Cats are cute animals.",
+    ]
+    index = BM25Index()
+    index.add_documents(docs)
+    print("Results for 'AB-1234.5':", index.search("AB-1234.5", top_k=2))
+    print("Results for 'clause 4.2.1':", index.search("clause 4.2.1", top_k=2))
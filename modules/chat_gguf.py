@@ -0,0 +1,343 @@
+import os
+import sys
+import uuid
+import atexit
+import hashlib
+import pickle
+import shutil
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+# 🔧 Ensure project root (C:\local_ai) is on sys.path
+PROJECT_ROOT = os.path.dirname(os.path.dirname(__file__))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+
+from modules.embedder import embed_texts
+from modules.vector_store import VectorStore
+from modules.multi_rag_gguf import build_context_text_gguf
+# Same lock as generate_answer()/unload_llm(): chat turns, one-shot answers and
+# unloading all share the one llama.cpp context, so they must queue on one lock
+from modules.local_llm_gguf import _lock, load_llm
+from modules.resource_manager import resource_manager
+
+# Total RAM for saved llama.cpp states of inactive conversations; older ones spill to disk
+STATE_BUDGET_BYTES = 2 * 1024 ** 3
+# Disk for spilled states (each process spills to its own sub-folder); oldest spills are
+# deleted beyond it, which only costs that conversation one full prefill
+STATE_SPILL_BUDGET_BYTES = 8 * 1024 ** 3
+STATE_SPILL_DIR = os.path.join(PROJECT_ROOT, "cache", "chat_states")
+# Conversations kept in memory; the least recently active ones are forgotten (history + state)
+MAX_SESSIONS = 256
+# Tokens kept free in the context window for the answer + chat template overhead
+CONTEXT_MARGIN_TOKENS = 64
+MESSAGE_OVERHEAD_TOKENS = 8  # chat template tokens per message (approximate)
+SUMMARY_MAX_CHARS = 1500
+
+SYSTEM_PROMPT = (
+    "You are a helpful assistant chatting about a collection of PDFs. "
+    "Each user message comes with PDF context; use ONLY that context (and the earlier "
+    "conversation) to answer, in a clear, concise way. If the context is empty or not "
+    "relevant, say that the PDFs did not contain enough information."
+)
+
+
+class ConversationStateCache:
+    """
+    LRU cache of evaluated llama.cpp states (KV cache + tokens), one per conversation.
+    States stay in RAM up to `capacity_bytes`; least recently used ones are pickled to a
+    per-process folder under `spill_dir`, which keeps at most `spill_capacity_bytes`
+    (oldest spills are deleted) and is removed when the process exits.
+    """
+
+    def __init__(
+        self,
+        capacity_bytes: int = STATE_BUDGET_BYTES,
+        spill_dir: str = STATE_SPILL_DIR,
+        spill_capacity_bytes: int = STATE_SPILL_BUDGET_BYTES,
+    ):
+        self.capacity_bytes = capacity_bytes
+        self.spill_capacity_bytes = spill_capacity_bytes
+        # Other worker processes spill to the same parent folder, so never touch it as a whole
+        self.spill_dir = os.path.join(spill_dir, f"{os.getpid()}-{uuid.uuid4().hex[:8]}")
+        self._states: "OrderedDict[str, object]" = OrderedDict()
+        self._sizes: Dict[str, int] = {}
+        self._spilled: "OrderedDict[str, int]" = OrderedDict()  # session -> spill file bytes, oldest first
+        self.total_bytes = 0
+        self.spilled_bytes = 0
+        atexit.register(self.clear_spills)
+
+    @staticmethod
+    def _state_size(state) -> int:
+        size = getattr(state, "llama_state_size", 0)
+        for name in ("input_ids", "scores"):
+            arr = getattr(state, name, None)
+            size += getattr(arr, "nbytes", 0)
+        return size
+
+    def _spill_path(self, session_id: str) -> str:
+        name = hashlib.sha1(session_id.encode("utf-8")).hexdigest()
+        return os.path.join(self.spill_dir, f"{name}.state")
+
+    def put(self, session_id: str, state):
+        self.drop(session_id)
+        size = self._state_size(state)
+        self._states[session_id] = state
+        self._sizes[session_id] = size
+        self.total_bytes += size
+        self._evict()
+
+    def spill_all(self):
+        """
+        Move every state held in RAM to disk (the disk budget still applies).
+        """
+        while self._states:
+            session_id, state = self._states.popitem(last=False)
+            self.total_bytes -= self._sizes.pop(session_id)
+            self._spill(session_id, state)
+
+    def get(self, session_id: str):
+        """
+        Return the saved state (from RAM or disk) or None if the conversation has none yet.
+        """
+        if session_id in self._states:
+            self._states.move_to_end(session_id)
+            return self._states[session_id]
+
+        if session_id not in self._spilled:
+            return None
+
+        print(f"💾 Restoring spilled chat state for session {session_id[:8]}...")
+        path = self._spill_path(session_id)
+        with open(path, "rb") as f:
+            state = pickle.load(f)
+        self._remove_spill(session_id)
+        self.put(session_id, state)
+        return state
+
+    def drop(self, session_id: str):
+        if session_id in self._states:
+            del self._states[session_id]
+            self.total_bytes -= self._sizes.pop(session_id)
+        if session_id in self._spilled:
+            self._remove_spill(session_id)
+
+    def _remove_spill(self, session_id: str):
+        self.spilled_bytes -= self._spilled.pop(session_id)
+        path = self._spill_path(session_id)
+        if os.path.exists(path):
+            os.remove(path)
+
+    def _spill(self, session_id: str, state):
+        os.makedirs(self.spill_dir, exist_ok=True)
+        path = self._spill_path(session_id)
+        with open(path, "wb") as f:
+            pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+        self._spilled[session_id] = os.path.getsize(path)
+        self.spilled_bytes += self._spilled[session_id]
+        print(f"💾 Spilled chat state for session {session_id[:8]} to disk")
+
+        while self.spilled_bytes > self.spill_capacity_bytes and self._spilled:
+            old_id = next(iter(self._spilled))
+            self._remove_spill(old_id)
+            print(f"🗑️ Deleted spilled chat state for session {old_id[:8]} (disk budget)")
+
+    def _evict(self):
+        # Always keep the most recent state in RAM, even if it alone exceeds the budget
+        while self.total_bytes > self.capacity_bytes and len(self._states) > 1:
+            session_id, state = self._states.popitem(last=False)
+            self.total_bytes -= self._sizes.pop(session_id)
+            self._spill(session_id, state)
+
+    def clear_spills(self):
+        """
+        Delete this process's spill folder (registered with atexit).
+        """
+        self._spilled.clear()
+        self.spilled_bytes = 0
+        shutil.rmtree(self.spill_dir, ignore_errors=True)
+
+
+class ChatSession:
+    """
+    History of one conversation: finished turns plus a summary of turns that no longer fit.
+    """
+
+    def __init__(self):
+        self.turns: List[Dict[str, str]] = []  # {"question", "context", "answer"}
+        self.summary = ""
+
+
+_state_cache = ConversationStateCache()
+_sessions: "OrderedDict[str, ChatSession]" = OrderedDict()  # least recently active first
+_active_session: Optional[str] = None  # conversation whose state is currently loaded in the LLM
+
+
+def _spill_chat_states():
+    # Unload for the resource manager: states in RAM go to disk and are restored on the next turn
+    with _lock:
+        _state_cache.spill_all()
+
+
+resource_manager.register("chat_states", lambda: _state_cache.total_bytes, _spill_chat_states)
+
+
+def _get_session(session_id: str) -> ChatSession:
+    """
+    Return (or create) a session and mark it most recently active; call with _lock held.
+    Sessions beyond MAX_SESSIONS are forgotten together with their saved states.
+    """
+    global _active_session
+
+    session = _sessions.get(session_id)
+    if session is None:
+        session = _sessions[session_id] = ChatSession()
+    _sessions.move_to_end(session_id)
+
+    while len(_sessions) > MAX_SESSIONS:
+        old_id, _ = _sessions.popitem(last=False)
+        _state_cache.drop(old_id)
+        if _active_session == old_id:
+            _active_session = None
+        print(f"🧹 [Chat] Forgot inactive session {old_id[:8]}")
+    return session
+
+
+def _user_content(context_text: str, question: str) -> str:
+    if not context_text.strip():
+        context_text = "(no relevant PDF context found)"
+    return f"PDF CONTEXT:\n{context_text}\n\nQUESTION:\n{question}"
+
+
+def _build_messages(session: ChatSession, context_text: str, question: str) -> List[Dict[str, str]]:
+    """
+    Messages are append-only between compactions, so llama.cpp can reuse the evaluated prefix.
+    """
+    system = SYSTEM_PROMPT
+    if session.summary:
+        system += f"\n\nSummary of the earlier conversation:\n{session.summary}"
+
+    messages = [{"role": "system", "content": system}]
+    for turn in session.turns:
+        messages.append({"role": "user", "content": _user_content(turn["context"], turn["question"])})
+        messages.append({"role": "assistant", "content": turn["answer"]})
+    messages.append({"role": "user", "content": _user_content(context_text, question)})
+    return messages
+
+
+def _count_tokens(llm, messages: List[Dict[str, str]]) -> int:
+    return sum(
+        len(llm.tokenize(m["content"].encode("utf-8"), add_bos=False)) + MESSAGE_OVERHEAD_TOKENS
+        for m in messages
+    )
+
+
+def _summarize_turn(turn: Dict[str, str]) -> str:
+    # Cheap extractive summary: the question and the first sentence of the answer
+    answer = turn["answer"].strip().split("\n")[0]
+    first_sentence = answer.split(". ")[0][:300]
+    return f"- Q: {turn['question'][:200]} A: {first_sentence}"
+
+
+def _fit_messages(
+    llm,
+    session: ChatSession,
+    context_text: str,
+    question: str,
+    max_tokens: int,
+) -> List[Dict[str, str]]:
+    """
+    Compact the history until the prompt fits in n_ctx.
+    First drop the PDF context of earlier turns, then fold the oldest turns into the summary.
+    Each compaction changes the prefix once; later turns are incremental again.
+    """
+    budget = llm.n_ctx() - max_tokens - CONTEXT_MARGIN_TOKENS
+    messages = _build_messages(session, context_text, question)
+    if _count_tokens(llm, messages) <= budget:
+        return messages
+
+    if any(turn["context"] for turn in session.turns):
+        print("✂️ [Chat] History too long, dropping PDF context of earlier turns")
+        for turn in session.turns:
+            turn["context"] = ""
+        messages = _build_messages(session, context_text, question)
+
+    while session.turns and _count_tokens(llm, messages) > budget:
+        print("✂️ [Chat] History too long, summarizing the oldest turn")
+        turn = session.turns.pop(0)
+        summary = f"{session.summary}\n{_summarize_turn(turn)}".strip()
+        session.summary = summary[-SUMMARY_MAX_CHARS:]
+        messages = _build_messages(session, context_text, question)
+
+    return messages
+
+
+def answer_chat_turn_gguf(
+    store: VectorStore,
+    session_id: str,
+    question: str,
+    top_k: int = 5,
+    max_tokens: int = 256,
+    search_mode: str = "dense",
+) -> str:
+    """
+    Multi-turn RAG chat on the GGUF model.
+
+    The conversation's evaluated llama.cpp state is restored before generating, so only
+    the new PDF context and question are prefilled; history is compacted to fit n_ctx.
+    """
+    global _active_session
+
+    with _lock:
+        session = _get_session(session_id)
+    print(f"❓ [Chat] Session {session_id[:8]}, turn {len(session.turns) + 1}: {question}")
+
+    q_vec = embed_texts([question])[0]
+    context_text = build_context_text_gguf(store, question, q_vec, top_k=top_k, search_mode=search_mode)
+
+    llm = load_llm()
+    with _lock:  # one llama.cpp context, so turns (and other generations) run one at a time
+        messages = _fit_messages(llm, session, context_text, question, max_tokens)
+
+        if _active_session != session_id:
+            if _active_session is not None:
+                _state_cache.put(_active_session, llm.save_state())
+            state = _state_cache.get(session_id)
+            if state is not None:
+                llm.load_state(state)
+            _active_session = session_id
+            resource_manager.touch("chat_states")
+
+        # create_chat_completion only evaluates tokens after the longest common prefix
+        resp = llm.create_chat_completion(
+            messages=messages,
+            max_tokens=max_tokens,
+            temperature=0.7,
+        )
+
+    answer = resp["choices"][0]["message"]["content"]
+    session.turns.append({"question": question, "context": context_text, "answer": answer})
+    print(f"✅ [Chat] Prompt tokens: {resp['usage']['prompt_tokens']}, answer tokens: {resp['usage']['completion_tokens']}")
+    return answer
+
+
+def reset_chat_session(session_id: str):
+    """
+    Forget a conversation's history and saved llama.cpp state.
+    """
+    global _active_session
+    with _lock:
+        _sessions.pop(session_id, None)
+        _state_cache.drop(session_id)
+        if _active_session == session_id:
+            _active_session = None
+
+
+if __name__ == "__main__":
+    from modules.multi_rag_gguf import build_vector_store_from_folder_gguf
+
+    folder = r"C:\local_ai\data"
+    store, chunks = build_vector_store_from_folder_gguf(folder)
+
+    for q in ["What is the main topic across these documents?", "Can you give more detail on that?"]:
+        print("\n🧠 [Chat] Answer:\n", answer_chat_turn_gguf(store, "demo", q))
@@ -1,37 +1,181 @@
+import os
+import sys
+import time
+import threading
 import numpy as np
-from typing import List, Tuple
+from typing import Dict, List, Optional, Tuple
 from sentence_transformers import SentenceTransformer
 
+# 🔧 Make sure project root (C:\local_ai) is on sys.path
+PROJECT_ROOT = os.path.dirname(os.path.dirname(__file__))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+
+from modules.resource_manager import resource_manager, torch_module_bytes
+
 # We'll use a small, fast, very popular model
 MODEL_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+EMBEDDING_DIM = 384  # dim of MiniLM-L6-v2
+
+# Which backend embed_texts() uses by default:
+# - "torch"       : plain PyTorch SentenceTransformer (original behaviour)
+# - "torch-int8"  : PyTorch with dynamic int8 quantization of the Linear layers
+# - "onnx"        : ONNX Runtime (needs `pip install sentence-transformers[onnx]`)
+# - "onnx-int8"   : ONNX Runtime with the int8-quantized ONNX export of the model
+EMBEDDER_BACKEND = "torch"
+EMBED_BATCH_SIZE = 32
+EMBED_NUM_THREADS: Optional[int] = None  # None = let torch / onnxruntime decide
+
+# Quantized ONNX file shipped in the MiniLM hub repo (AVX2 works on any modern x86 CPU)
+ONNX_INT8_FILE = "onnx/model_quint8_avx2.onnx"
+
+BACKENDS = ("torch", "torch-int8", "onnx", "onnx-int8")
+
+# Keyed by (backend, ONNX session threads); torch backends use None since their
+# thread count is set per call
+_models: Dict[Tuple[str, Optional[int]], SentenceTransformer] = {}
+_lock = threading.Lock()  # so concurrent first calls load each backend only once
+
+
+def _model_key(backend: str, num_threads: Optional[int] = None) -> Tuple[str, Optional[int]]:
+    if backend.startswith("onnx"):
+        return backend, num_threads or EMBED_NUM_THREADS
+    return backend, None
+
+
+def _onnx_model_kwargs(num_threads: Optional[int]) -> dict:
+    """
+    Build model_kwargs for the ONNX backend (session threads, optional file name).
+    """
+    kwargs = {"provider": "CPUExecutionProvider"}
+    if num_threads:
+        import onnxruntime as ort
+
+        session_options = ort.SessionOptions()
+        session_options.intra_op_num_threads = num_threads
+        kwargs["session_options"] = session_options
+    return kwargs
+
+
+def load_embedder(backend: Optional[str] = None, num_threads: Optional[int] = None) -> SentenceTransformer:
+    """
+    Lazy-load the sentence transformer model only once per backend.
+    ONNX sessions fix their thread count when created, so each num_threads gets its own session.
+    """
+    backend = backend or EMBEDDER_BACKEND
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown embedder backend '{backend}'. Choose one of: {', '.join(BACKENDS)}")
+
+    key = _model_key(backend, num_threads)
+    model = _models.get(key)
+    if model is not None:
+        resource_manager.touch("embedder")
+        return model
+
+    with _lock:
+        if key in _models:
+            return _models[key]
+        _models[key] = model = _create_embedder(backend, key[1])
 
-_model = None
+    resource_manager.loaded("embedder")
+    return model
 
 
-def load_embedder() -> SentenceTransformer:
+def unload_embedder():
     """
-    Lazy-load the sentence transformer model only once.
+    Drop all loaded backends; the next embed_texts() loads the model again.
     """
-    global _model
-    if _model is not None:
-        return _model
+    with _lock:
+        _models.clear()
+
+
+def _embedder_size() -> int:
+    # ONNX sessions hold their weights outside torch, so they report 0 here
+    return sum(torch_module_bytes(m) for m in list(_models.values()))
+
+
+def _create_embedder(backend: str, onnx_threads: Optional[int] = None) -> SentenceTransformer:
+    print(f"🚀 Loading embedding model: {MODEL_NAME} [{backend}] (first time might be slow)...")
+
+    if backend == "torch":
+        model = SentenceTransformer(MODEL_NAME)
+    elif backend == "torch-int8":
+        import torch
+
+        model = SentenceTransformer(MODEL_NAME, device="cpu")
+        # Quantize all Linear layers to int8; activations stay fp32 (dynamic quantization)
+        model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    else:
+        model_kwargs = _onnx_model_kwargs(onnx_threads)
+        if backend == "onnx-int8":
+            model_kwargs["file_name"] = ONNX_INT8_FILE
+        model = SentenceTransformer(MODEL_NAME, device="cpu", backend="onnx", model_kwargs=model_kwargs)
 
-    print(f"🚀 Loading embedding model: {MODEL_NAME} (first time might be slow)...")
-    _model = SentenceTransformer(MODEL_NAME)
     print("✅ Embedding model loaded")
-    return _model
+    return model
+
 
+resource_manager.register("embedder", _embedder_size, unload_embedder)
 
-def embed_texts(texts: List[str]) -> np.ndarray:
+
+def embed_texts(
+    texts: List[str],
+    batch_size: Optional[int] = None,
+    num_threads: Optional[int] = None,
+    backend: Optional[str] = None,
+) -> np.ndarray:
     """
     Given a list of strings, return a 2D numpy array of shape (len(texts), embedding_dim).
+
+    batch_size / num_threads default to EMBED_BATCH_SIZE / EMBED_NUM_THREADS.
+    For the torch backends num_threads sets torch's process-wide thread count for the duration
+    of this call (restored afterwards); for ONNX it selects a session created with that many threads.
     """
     if not texts:
-        return np.zeros((0, 384), dtype="float32")  # 384 is dim of MiniLM-L6-v2
+        return np.zeros((0, EMBEDDING_DIM), dtype="float32")
 
-    model = load_embedder()
-    embeddings = model.encode(texts, show_progress_bar=False, convert_to_numpy=True)
-    return embeddings
+    backend = backend or EMBEDDER_BACKEND
+    batch_size = batch_size or EMBED_BATCH_SIZE
+    num_threads = num_threads or EMBED_NUM_THREADS
+
+    model = load_embedder(backend, num_threads)
+    previous_threads = None
+    if num_threads and backend.startswith("torch"):
+        import torch
+
+        previous_threads = torch.get_num_threads()
+        torch.set_num_threads(num_threads)
+
+    try:
+        embeddings = model.encode(
+            texts,
+            batch_size=batch_size,
+            show_progress_bar=False,
+            convert_to_numpy=True,
+        )
+    finally:
+        if previous_threads is not None:
+            torch.set_num_threads(previous_threads)
+    return embeddings.astype("float32", copy=False)
+
+
+def check_backend_agreement(
+    texts: List[str],
+    backend: str,
+    reference: str = "torch",
+) -> Tuple[float, float]:
+    """
+    Embed the same texts with `backend` and `reference` and compare them row by row.
+    Returns (mean_cosine, min_cosine). Values close to 1.0 mean vectors from `backend`
+    can be searched against an index built with `reference`.
+    """
+    ref = embed_texts(texts, backend=reference)
+    other = embed_texts(texts, backend=backend)
+
+    ref = ref / (np.linalg.norm(ref, axis=1, keepdims=True) + 1e-10)
+    other = other / (np.linalg.norm(other, axis=1, keepdims=True) + 1e-10)
+    cosines = np.sum(ref * other, axis=1)
+    return float(cosines.mean()), float(cosines.min())
 
 
 if __name__ == "__main__":
@@ -44,3 +188,21 @@ if __name__ == "__main__":
     vecs = embed_texts(sample_texts)
     print(f"Embeddings shape: {vecs.shape}")
     print("First vector (first 5 dims):", vecs[0][:5])
+
+    # Compare the faster backends against the reference PyTorch vectors
+    bench_texts = sample_texts * 64
+    for name in BACKENDS:
+        try:
+            embed_texts(sample_texts, backend=name)  # warm-up / load
+            start = time.perf_counter()
+            embed_texts(bench_texts, backend=name)
+            elapsed = time.perf_counter() - start
+            mean_cos, min_cos = check_backend_agreement(sample_texts, name)
+            print(
+                f"🔍 {name}: {len(bench_texts) / elapsed:.1f} texts/s, "
+                f"mean cosine={mean_cos:.4f}, min cosine={min_cos:.4f} vs torch"
+            )
+        except ImportError as e:
+            print(f"⚠️ Backend {name} not available (missing package): {e!r}")
+        except Exception as e:
+            print(f"❌ Backend {name} failed: {e!r}")
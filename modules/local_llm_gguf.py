@@ -1,8 +1,13 @@
 import os
+import sys
 print("✅ local_llm_gguf.py started")
 
+import threading
+import numpy as np
+
 try:
     from llama_cpp import Llama
+    from llama_cpp.llama_speculative import LlamaDraftModel, LlamaPromptLookupDecoding
     print("✅ Imported llama_cpp successfully")
 except Exception as e:
     print("❌ Error importing llama_cpp:", repr(e))
@@ -11,35 +16,142 @@ except Exception as e:
 # Build path to models/llm.gguf
 PROJECT_ROOT = os.path.dirname(os.path.dirname(__file__))
 MODEL_PATH = os.path.join(PROJECT_ROOT, "models", "llm.gguf")
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+
+from modules.resource_manager import resource_manager
+
+# True maps the weights from the file instead of reading them into RAM: loading (and
+# reloading after an idle unload, see modules/resource_manager.py) comes from the OS page cache
+USE_MMAP = False
 
 print("🔍 Project root:", PROJECT_ROOT)
 print("🔍 Model path:", MODEL_PATH)
 print("🔍 Model exists?", os.path.exists(MODEL_PATH))
 
 
+# Speculative decoding (big speed-up when answers copy phrases from the PDF context):
+# - "off"           : plain decoding
+# - "prompt_lookup" : draft tokens by matching the last n-gram against the prompt (no extra model)
+# - "draft_model"   : draft tokens with a small GGUF model sharing the same vocabulary
+SPECULATIVE_DECODING = "off"
+DRAFT_NUM_PRED_TOKENS = 10   # tokens drafted per step
+PROMPT_LOOKUP_MAX_NGRAM = 2  # n-gram size used to find matches in the prompt
+DRAFT_MODEL_PATH = os.path.join(PROJECT_ROOT, "models", "draft.gguf")
+
+
+class GGUFDraftModel(LlamaDraftModel):
+    """
+    Draft model backed by a small GGUF model (e.g. a 1B model from the same family).
+    Greedily proposes `num_pred_tokens` tokens; llama-cpp verifies them with the main model.
+    """
+
+    def __init__(self, model_path: str, num_pred_tokens: int = 10, n_ctx: int = 4096):
+        if not os.path.exists(model_path):
+            raise FileNotFoundError(f"Draft GGUF model not found at {model_path}")
+        self.num_pred_tokens = num_pred_tokens
+        self.llm = Llama(
+            model_path=model_path,
+            n_ctx=n_ctx,
+            n_threads=4,
+            n_gpu_layers=-1,
+            verbose=False,
+        )
+
+    def __call__(self, input_ids, /, **kwargs):
+        draft = []
+        # generate() reuses the longest common prefix, so only new tokens are evaluated
+        for token in self.llm.generate(input_ids.tolist(), top_k=1, temp=0.0, reset=True):
+            if token == self.llm.token_eos():
+                break
+            draft.append(token)
+            if len(draft) >= self.num_pred_tokens:
+                break
+        return np.array(draft, dtype=np.intc)
+
+
+def create_draft_model(mode: str, num_pred_tokens: int = DRAFT_NUM_PRED_TOKENS):
+    """
+    Build the llama-cpp draft model for a speculative decoding mode (None for "off").
+    """
+    if mode == "off":
+        return None
+    if mode == "prompt_lookup":
+        return LlamaPromptLookupDecoding(
+            max_ngram_size=PROMPT_LOOKUP_MAX_NGRAM,
+            num_pred_tokens=num_pred_tokens,
+        )
+    if mode == "draft_model":
+        return GGUFDraftModel(DRAFT_MODEL_PATH, num_pred_tokens=num_pred_tokens)
+    raise ValueError(f"Unknown speculative mode '{mode}'. Use 'off', 'prompt_lookup' or 'draft_model'.")
+
+
+def create_llm(speculative: str = "off", draft_model=None):
+    """
+    Create a new Llama instance. Pass `draft_model` to override the one built from `speculative`.
+    """
+    if not os.path.exists(MODEL_PATH):
+        raise FileNotFoundError(f"GGUF model not found at {MODEL_PATH}")
+
+    if draft_model is None:
+        draft_model = create_draft_model(speculative)
+
+    return Llama(
+        model_path=MODEL_PATH,
+        n_ctx=4096,
+        n_threads=4,         # CPU only used a little
+        n_gpu_layers=-1,     # USE GPU FOR ALL LAYERS 🔥
+        use_mmap=USE_MMAP,   # False is faster on Windows GPU
+        use_mlock=False,
+        draft_model=draft_model,
+    )
+
+
 # Load model once (global)
 _llm = None
+# One llama.cpp context is not safe to use from several threads (e.g. Streamlit sessions)
+_lock = threading.RLock()
 
 def load_llm():
     global _llm
-    if _llm is not None:
-        return _llm
+    llm = _llm
+    if llm is not None:
+        resource_manager.touch("gguf_llm")
+        return llm
 
-    if not os.path.exists(MODEL_PATH):
-        raise FileNotFoundError(f"GGUF model not found at {MODEL_PATH}")
+    with _lock:
+        if _llm is not None:
+            return _llm
+        print(f"🚀 Loading GGUF model with llama-cpp (speculative={SPECULATIVE_DECODING})...")
+        _llm = llm = create_llm(SPECULATIVE_DECODING)
+        print("✅ GGUF model loaded successfully")
 
-    print("🚀 Loading GGUF model with llama-cpp...")
-    _llm = Llama(
-    model_path=MODEL_PATH,
-    n_ctx=4096,
-    n_threads=4,         # CPU only used a little
-    n_gpu_layers=-1,     # USE GPU FOR ALL LAYERS 🔥
-    use_mmap=False,      # faster on Windows GPU
-    use_mlock=False,
-)
+    # Outside our lock: making room may unload other components (which take their own locks)
+    resource_manager.loaded("gguf_llm")
+    return llm
 
-    print("✅ GGUF model loaded successfully")
-    return _llm
+
+def unload_llm():
+    """
+    Drop the global model; the next load_llm() loads it again.
+    Waits for a running generation (same lock) so the context isn't freed mid-answer.
+    """
+    global _llm
+    with _lock:
+        _llm = None
+
+
+def _llm_size() -> int:
+    # Weights dominate; the KV cache for n_ctx comes on top
+    if _llm is None:
+        return 0
+    size = os.path.getsize(MODEL_PATH)
+    if SPECULATIVE_DECODING == "draft_model" and os.path.exists(DRAFT_MODEL_PATH):
+        size += os.path.getsize(DRAFT_MODEL_PATH)
+    return size
+
+
+resource_manager.register("gguf_llm", _llm_size, unload_llm)
 
 
 def generate_answer(prompt: str, max_tokens: int = 256) -> str:
@@ -48,14 +160,15 @@ def generate_answer(prompt: str, max_tokens: int = 256) -> str:
     """
     llm = load_llm()
     print("🤖 Generating answer from GGUF model...")
-    resp = llm.create_chat_completion(
-        messages=[
-            {"role": "system", "content": "You are a helpful, concise assistant."},
-            {"role": "user", "content": prompt},
-        ],
-        max_tokens=max_tokens,
-        temperature=0.7,
-    )
+    with _lock:  # concurrent callers queue here instead of sharing the context
+        resp = llm.create_chat_completion(
+            messages=[
+                {"role": "system", "content": "You are a helpful, concise assistant."},
+                {"role": "user", "content": prompt},
+            ],
+            max_tokens=max_tokens,
+            temperature=0.7,
+        )
     text = resp["choices"][0]["message"]["content"]
     print("✅ Got response from GGUF model")
     return text
@@ -0,0 +1,328 @@
+import os
+import sys
+import time
+import json
+import uuid
+import shutil
+import threading
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+# 🔧 Make sure project root (C:\local_ai) is on sys.path
+PROJECT_ROOT = os.path.dirname(os.path.dirname(__file__))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+
+from modules.bm25_index import BM25Index
+from modules.resource_manager import resource_manager
+from modules.vector_store import SEARCH_MODES, VectorStore, fuse_scores
+
+# Layout of a shared index folder:
+#   CURRENT                  -> name of the live version folder (swapped atomically)
+#   v-<time>-<id>/vectors.npy        normalized float32 vectors, opened with mmap
+#   v-<time>-<id>/chunks.bin         all chunk texts, utf-8, back to back
+#   v-<time>-<id>/chunk_offsets.npy  byte offsets into chunks.bin (n + 1 entries)
+#   v-<time>-<id>/bm25*              optional BM25 index (.npy arrays, opened with mmap too)
+CURRENT_FILE = "CURRENT"
+KEEP_VERSIONS = 2
+# search_batch scores the corpus this many rows at a time (queries x rows float32 scores per block)
+SEARCH_BLOCK_ROWS = 65536
+
+
+def publish_store(store: VectorStore, root: str) -> str:
+    """
+    Write a VectorStore as a new version under `root` and make it the live one.
+    Workers using MmapVectorStore pick it up on their next search, no restart needed.
+    Returns the version folder.
+    """
+    if not isinstance(store, VectorStore):
+        raise TypeError("publish_store needs a single-process VectorStore")
+
+    os.makedirs(root, exist_ok=True)
+    tmp_dir = os.path.join(root, f".tmp-{uuid.uuid4().hex}")
+    os.makedirs(tmp_dir)
+
+    vectors = store.index.reconstruct_n(0, store.index.ntotal).astype("float32")
+    np.save(os.path.join(tmp_dir, "vectors.npy"), vectors)
+
+    encoded = [c.encode("utf-8") for c in store.text_chunks]
+    offsets = np.zeros(len(encoded) + 1, dtype="int64")
+    offsets[1:] = np.cumsum([len(b) for b in encoded])
+    np.save(os.path.join(tmp_dir, "chunk_offsets.npy"), offsets)
+    with open(os.path.join(tmp_dir, "chunks.bin"), "wb") as f:
+        for b in encoded:
+            f.write(b)
+
+    if store.lexical_index is not None:
+        store.lexical_index.save(tmp_dir)
+
+    version = f"v-{int(time.time() * 1000)}-{uuid.uuid4().hex[:6]}"
+    os.replace(tmp_dir, os.path.join(root, version))
+
+    # Atomic swap: readers either see the old or the new CURRENT, never a partial file
+    current_tmp = os.path.join(root, f".{CURRENT_FILE}-{uuid.uuid4().hex}")
+    with open(current_tmp, "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(current_tmp, os.path.join(root, CURRENT_FILE))
+    print(f"📤 Published index version {version} ({len(encoded)} chunks) to {root}")
+
+    _remove_old_versions(root, keep=version)
+    return os.path.join(root, version)
+
+
+def _remove_old_versions(root: str, keep: str):
+    versions = sorted(d for d in os.listdir(root) if d.startswith("v-") and d != keep)
+    for old in versions[: max(0, len(versions) - (KEEP_VERSIONS - 1))]:
+        # Workers may still have it mapped; on Windows that makes deletion fail, so try later
+        shutil.rmtree(os.path.join(root, old), ignore_errors=True)
+
+
+def has_published_index(root: str) -> bool:
+    return os.path.exists(os.path.join(root, CURRENT_FILE))
+
+
+class _MmapChunks:
+    """
+    Read-only list-like view of chunk texts stored in one memory-mapped file.
+    """
+
+    def __init__(self, folder: str):
+        self.offsets = np.load(os.path.join(folder, "chunk_offsets.npy"), mmap_mode="r")
+        size = int(self.offsets[-1])
+        path = os.path.join(folder, "chunks.bin")
+        self.data = np.memmap(path, dtype="uint8", mode="r") if size else np.zeros(0, dtype="uint8")
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> str:
+        start, end = int(self.offsets[i]), int(self.offsets[i + 1])
+        return self.data[start:end].tobytes().decode("utf-8")
+
+
+class _IndexState:
+    """
+    One opened version of a shared index. Never modified after creation, so a query that
+    read `store._state` once keeps a consistent view even if the store swaps or releases it.
+    """
+
+    def __init__(self, folder: str, version: str):
+        self.version = version
+        self.vectors = np.load(os.path.join(folder, "vectors.npy"), mmap_mode="r")
+        self.chunks = _MmapChunks(folder)
+        self.lexical_index = BM25Index.load(folder)
+
+
+class MmapVectorStore:
+    """
+    Read-only vector store opened from a folder written by publish_store().
+
+    Vectors and chunks are memory-mapped, so every worker process on the host shares one
+    copy through the OS page cache and opening takes milliseconds. When a new version is
+    published the store switches to it on the next search (checked every `check_interval` s).
+    Same search() API as VectorStore.
+
+    The store registers with the resource manager as `resource_name`: release() (called
+    when it is idle or over budget) drops the mappings and the next search re-maps them.
+    """
+
+    def __init__(self, root: str, check_interval: float = 1.0, resource_name: Optional[str] = None):
+        self.root = root
+        self.check_interval = check_interval
+        self._state: Optional[_IndexState] = None
+        self._open_lock = threading.Lock()  # one thread opens a version, the others wait for it
+        self._last_check = 0.0
+        self.resource_name = resource_name or f"index:{os.path.basename(os.path.normpath(root))}"
+        resource_manager.register(self.resource_name, self.resident_bytes, self.release)
+        self._reload()
+
+    def _read_current(self) -> str:
+        path = os.path.join(self.root, CURRENT_FILE)
+        if not os.path.exists(path):
+            raise FileNotFoundError(f"No published index in {self.root}")
+        with open(path, "r", encoding="utf-8") as f:
+            return f.read().strip()
+
+    def _reload(self) -> Tuple[_IndexState, bool]:
+        """
+        Open the live version unless it is already open. The new state is built completely
+        and then published with a single assignment. Returns (state, opened).
+        """
+        with self._open_lock:
+            self._last_check = time.monotonic()
+            version = self._read_current()
+            state = self._state
+            if state is not None and state.version == version:
+                return state, False
+
+            start = time.perf_counter()
+            state = _IndexState(os.path.join(self.root, version), version)
+            self._state = state
+            elapsed_ms = (time.perf_counter() - start) * 1000
+            print(f"📂 Opened shared index {version} ({len(state.chunks)} chunks) in {elapsed_ms:.1f} ms")
+
+        # Outside the lock: making room may call release() or other components' unload functions
+        resource_manager.loaded(self.resource_name)
+        return state, True
+
+    # Read-only views of the current version (re-opened if it was released)
+    @property
+    def version(self) -> Optional[str]:
+        state = self._state
+        return state.version if state is not None else None
+
+    @property
+    def vectors(self) -> np.ndarray:
+        return self._current().vectors
+
+    @property
+    def text_chunks(self) -> _MmapChunks:
+        return self._current().chunks
+
+    @property
+    def lexical_index(self) -> Optional[BM25Index]:
+        return self._current().lexical_index
+
+    @property
+    def dim(self) -> int:
+        return self._current().vectors.shape[1]
+
+    def release(self):
+        """
+        Drop the memory maps and BM25 arrays; they are re-opened on the next search.
+        Queries already running keep the state they started with.
+        """
+        self._state = None
+
+    def resident_bytes(self) -> int:
+        state = self._state
+        if state is None:
+            return 0
+        vectors, chunks, lexical = state.vectors, state.chunks, state.lexical_index
+        size = vectors.nbytes + chunks.data.nbytes + chunks.offsets.nbytes
+        if lexical is not None:
+            size += sum(a.nbytes for a in (lexical.offsets, lexical.post_docs, lexical.post_tfs, lexical.doc_len))
+        return size
+
+    def refresh(self) -> bool:
+        """
+        Switch to the live version if a newer one was published (or re-open it after
+        release()). Returns True if it opened a version.
+        """
+        return self._reload()[1]
+
+    def _current(self) -> _IndexState:
+        """
+        The state to use for one query: re-opened if released, switched if a newer version
+        was published. Read it once and use only that object for the whole query.
+        """
+        state = self._state
+        if state is None or time.monotonic() - self._last_check >= self.check_interval:
+            state, _ = self._reload()
+        resource_manager.touch(self.resource_name)
+        return state
+
+    def search(
+        self,
+        query_embedding: np.ndarray,
+        top_k: int = 5,
+        query_text: Optional[str] = None,
+        mode: str = "dense",
+        alpha: float = 0.5,
+        candidates: int = 50,
+    ) -> List[Tuple[str, float]]:
+        """
+        Same arguments and result as VectorStore.search.
+        """
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode '{mode}'. Use one of: {', '.join(SEARCH_MODES)}")
+
+        # One state object for the whole query: a concurrent swap or release() can't mix versions
+        state = self._current()
+        vectors, chunks, lexical = state.vectors, state.chunks, state.lexical_index
+        if len(vectors) == 0:
+            return []
+
+        q = query_embedding / (np.linalg.norm(query_embedding) + 1e-10)
+        q = q.astype("float32")
+
+        if mode != "dense":
+            if lexical is None or not query_text:
+                raise ValueError(f"Search mode '{mode}' needs a published BM25 index and query_text")
+            hits = self._score_candidates(vectors, chunks, lexical, q, query_text, mode, candidates)
+            if hits:
+                return fuse_scores(hits, top_k=top_k, alpha=alpha)
+
+        ids, scores = self._top_dense(vectors, q, top_k)
+        return [(chunks[i], float(s)) for i, s in zip(ids, scores)]
+
+    def search_batch(self, query_embeddings: np.ndarray, top_k: int = 5) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Same as VectorStore.search_batch: (scores, chunk_ids), both shape (n, top_k).
+
+        The corpus is scanned in blocks of SEARCH_BLOCK_ROWS with a running top-k, so memory
+        stays at queries x block scores instead of a full queries x corpus matrix.
+        """
+        vectors = self._current().vectors
+        norms = np.linalg.norm(query_embeddings, axis=1, keepdims=True) + 1e-10
+        q = (query_embeddings / norms).astype("float32")
+
+        k = min(top_k, len(vectors))
+        best_scores = np.full((len(q), 0), -np.inf, dtype="float32")
+        best = np.zeros((len(q), 0), dtype="int64")
+        for start in range(0, len(vectors), SEARCH_BLOCK_ROWS):
+            scores = q @ vectors[start:start + SEARCH_BLOCK_ROWS].T
+            kb = min(k, scores.shape[1])
+            ids = np.argpartition(-scores, kb - 1, axis=1)[:, :kb]
+            # Merge this block's top-k with the running top-k
+            best_scores = np.concatenate([best_scores, np.take_along_axis(scores, ids, axis=1)], axis=1)
+            best = np.concatenate([best, ids + start], axis=1)
+            if best.shape[1] > k:
+                keep = np.argpartition(-best_scores, k - 1, axis=1)[:, :k]
+                best_scores = np.take_along_axis(best_scores, keep, axis=1)
+                best = np.take_along_axis(best, keep, axis=1)
+
+        order = np.argsort(-best_scores, axis=1)
+        return np.take_along_axis(best_scores, order, axis=1), np.take_along_axis(best, order, axis=1)
+
+    @staticmethod
+    def _top_dense(vectors: np.ndarray, q: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        scores = vectors @ q
+        k = min(k, len(scores))
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        return best, scores[best]
+
+    def _score_candidates(self, vectors, chunks, lexical_index, q, query_text, mode, candidates):
+        lex_ids, lex_scores = lexical_index.score(query_text)
+        if len(lex_ids) == 0:
+            return []
+        if len(lex_ids) > candidates:
+            keep = np.argpartition(-lex_scores, candidates - 1)[:candidates]
+            lex_ids, lex_scores = lex_ids[keep], lex_scores[keep]
+        lexical = dict(zip(lex_ids.tolist(), lex_scores.tolist()))
+
+        ids = set(lexical)
+        if mode == "hybrid":
+            dense_ids, _ = self._top_dense(vectors, q, candidates)
+            ids.update(dense_ids.tolist())
+
+        ids = np.fromiter(ids, dtype="int64")
+        dense = vectors[ids] @ q
+        return [(chunks[i], float(d), lexical.get(int(i), 0.0)) for i, d in zip(ids, dense)]
+
+
+if __name__ == "__main__":
+    # Build the index once and publish it for all worker processes:
+    #   python modules/mmap_store.py C:\local_ai\data C:\local_ai\index
+    from modules.multi_rag_gguf import build_vector_store_from_folder_gguf
+
+    folder = sys.argv[1] if len(sys.argv) > 1 else r"C:\local_ai\data"
+    index_root = sys.argv[2] if len(sys.argv) > 2 else r"C:\local_ai\index"
+
+    store, chunks = build_vector_store_from_folder_gguf(folder)
+    publish_store(store, index_root)
+
+    shared = MmapVectorStore(index_root)
+    print("Results:", shared.search(store.index.reconstruct(0), top_k=2))
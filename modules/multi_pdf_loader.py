@@ -7,7 +7,7 @@ PROJECT_ROOT = os.path.dirname(os.path.dirname(__file__))
 if PROJECT_ROOT not in sys.path:
     sys.path.append(PROJECT_ROOT)
 
-from modules.pdf_loader import load_pdf_text
+from modules.pdf_loader import PageExtractor, load_pdf_text
 
 
 
@@ -21,20 +21,22 @@ def load_multiple_pdfs(folder_path: str) -> Dict[str, str]:
     if not os.path.exists(folder_path):
         raise FileNotFoundError(f"Folder not found: {folder_path}")
 
-    for file in os.listdir(folder_path):
-        if not file.lower().endswith(".pdf"):
-            continue
+    # One page worker process for the whole folder (started on the first PDF)
+    with PageExtractor() as extractor:
+        for file in os.listdir(folder_path):
+            if not file.lower().endswith(".pdf"):
+                continue
 
-        path = os.path.join(folder_path, file)
-        print(f"📄 Loading PDF: {file}")
-        text = load_pdf_text(path)
+            path = os.path.join(folder_path, file)
+            print(f"📄 Loading PDF: {file}")
+            text = load_pdf_text(path, extractor=extractor)
 
-        if not text.strip():
-            print(f"⚠️ {file} has no extractable text, skipping.")
-            continue
+            if not text.strip():
+                print(f"⚠️ {file} has no extractable text, skipping.")
+                continue
 
-        pdf_texts[file] = text
-        print(f"   ➜ Loaded {len(text)} characters")
+            pdf_texts[file] = text
+            print(f"   ➜ Loaded {len(text)} characters")
 
     if not pdf_texts:
         print("⚠️ No valid PDFs with text found in this folder.")
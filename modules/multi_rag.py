@@ -1,6 +1,6 @@
 import os
 import sys
-from typing import List, Tuple
+from typing import List, Optional, Tuple, Union
 
 import numpy as np
 
@@ -10,28 +10,50 @@ if PROJECT_ROOT not in sys.path:
     sys.path.append(PROJECT_ROOT)
 
 from modules.multi_pdf_loader import load_multiple_pdfs
+from modules.pdf_corpus import load_multiple_pdfs_from_corpus
 from modules.text_splitter import split_text_into_chunks
 from modules.embedder import embed_texts
+from modules.parallel_embedder import embed_texts_parallel
 from modules.vector_store import VectorStore
-from modules.local_llm import generate_answer
+from modules.sharded_store import ShardedVectorStore
+from modules.rag_context import format_context_text
+from modules.local_llm import (
+    MAX_INPUT_TOKENS,
+    count_prompt_tokens,
+    count_tokens,
+    generate_answer,
+    generate_answers,
+    truncate_to_tokens,
+)
+
+# Extra tokens trimmed off an oversized context so the final prompt stays within MAX_INPUT_TOKENS
+CONTEXT_TOKEN_MARGIN = 8
 
 
 def build_vector_store_from_folder(
     folder_path: str,
     chunk_size: int = 800,
     chunk_overlap: int = 200,
-) -> Tuple[VectorStore, List[str]]:
+    num_workers: int = 1,
+    num_shards: int = 1,
+    corpus_dir: Optional[str] = None,
+) -> Tuple[Union[VectorStore, ShardedVectorStore], List[str]]:
     """
-    1. Load ALL PDFs in folder
+    1. Load ALL PDFs in folder (from the extracted-page corpus if corpus_dir is set)
     2. Merge text from all PDFs
     3. Split into chunks
-    4. Embed chunks
-    5. Build FAISS vector store
+    4. Embed chunks (num_workers > 1 shards embedding across processes)
+    5. Build FAISS vector store (num_shards > 1 splits it across shard processes)
+       A ShardedVectorStore only supports search() (no search_batch, save or publish_store)
     Returns: (store, chunks_list)
     """
     print(f"📁 Building multi-PDF vector store from folder: {folder_path}")
 
-    pdf_texts = load_multiple_pdfs(folder_path)  # {filename: text}
+    if corpus_dir:
+        # Pages extracted once and kept on disk: re-chunking skips PDF parsing
+        pdf_texts = load_multiple_pdfs_from_corpus(folder_path, corpus_dir)  # {filename: text}
+    else:
+        pdf_texts = load_multiple_pdfs(folder_path)  # {filename: text}
 
     if not pdf_texts:
         raise ValueError("No valid PDFs with extractable text found.")
@@ -48,65 +70,111 @@ def build_vector_store_from_folder(
     print(f"✅ Total chunks from all PDFs: {len(all_chunks)}")
 
     print("🧮 Embedding all chunks...")
-    embeddings = embed_texts(all_chunks)
+    if num_workers > 1:
+        embeddings = embed_texts_parallel(all_chunks, num_workers=num_workers)
+    else:
+        embeddings = embed_texts(all_chunks)
     print(f"✅ Embeddings shape: {embeddings.shape}")
 
     dim = embeddings.shape[1]
-    store = VectorStore(dim=dim)
+    if num_shards > 1:
+        print(f"🧩 Starting {num_shards} shard processes...")
+        store = ShardedVectorStore(dim=dim, num_shards=num_shards)
+    else:
+        store = VectorStore(dim=dim)
 
     print("📦 Adding embeddings to vector store...")
     store.add_embeddings(embeddings, all_chunks)
+
+    print("🔎 Building BM25 lexical index...")
+    store.build_lexical_index()
     print("✅ Multi-PDF vector store ready")
 
     return store, all_chunks
 
 
-def answer_question_multi_pdf(
+def build_rag_prompt(
     store: VectorStore,
     question: str,
+    q_vec: np.ndarray,
     top_k: int = 5,
+    search_mode: str = "dense",
 ) -> str:
     """
-    Same as single-PDF RAG, but using the multi-PDF vector store.
+    Search the store with an already-embedded question and build the LLM prompt.
     """
-    from modules.embedder import embed_texts
-
-    print(f"❓ User question: {question}")
-
-    # 1) Embed question
-    q_emb = embed_texts([question])
-    q_vec = q_emb[0]
-
-    # 2) Search in FAISS
-    results = store.search(q_vec, top_k=top_k)
+    # Search in FAISS (optionally fused with BM25, see VectorStore.search)
+    results = store.search(q_vec, top_k=top_k, query_text=question, mode=search_mode)
 
     if not results:
         print("⚠️ No similar chunks found.")
         context_text = ""
     else:
         print(f"📚 Top {len(results)} chunks retrieved from ALL PDFs:")
-        context_parts = []
         for i, (chunk, score) in enumerate(results, start=1):
             print(f"  - Chunk {i}, score={score:.3f}, length={len(chunk)}")
-            context_parts.append(f"[Chunk {i}, score={score:.3f}]\n{chunk}\n")
-        context_text = "\n".join(context_parts)
+        context_text = format_context_text(results)
+
+    return format_rag_prompt(question, context_text)
+
 
+def _context_prompt(question: str, context_text: str) -> str:
+    return (
+        "You are a helpful assistant. Use ONLY the following PDF context (from multiple documents) "
+        "to answer the question.\n\n"
+        "PDF CONTEXT:\n"
+        f"{context_text}\n\n"
+        "QUESTION:\n"
+        f"{question}\n\n"
+        "Answer in a clear, concise way."
+    )
+
+
+def format_rag_prompt(question: str, context_text: str) -> str:
+    """
+    Build the Flan-T5 prompt from a question and its formatted PDF context.
+
+    The model reads at most MAX_INPUT_TOKENS tokens, so a context that does not fit is
+    cut from its end (the lowest ranked chunks go first); the instructions and the
+    question are always kept.
+    """
     if context_text.strip():
-        prompt = (
-            "You are a helpful assistant. Use ONLY the following PDF context (from multiple documents) "
-            "to answer the question.\n\n"
-            "PDF CONTEXT:\n"
-            f"{context_text}\n\n"
-            "QUESTION:\n"
-            f"{question}\n\n"
-            "Answer in a clear, concise way."
-        )
+        prompt = _context_prompt(question, context_text)
+        overflow = count_prompt_tokens(prompt) - MAX_INPUT_TOKENS
+        if overflow > 0:
+            # Tokens don't add up exactly across the cut, so leave a small margin
+            budget = count_tokens(context_text) - overflow - CONTEXT_TOKEN_MARGIN
+            print(f"✂️ Trimming PDF context by {overflow + CONTEXT_TOKEN_MARGIN} tokens to fit {MAX_INPUT_TOKENS}")
+            context_text = truncate_to_tokens(context_text, budget)
+            prompt = _context_prompt(question, context_text)
     else:
         prompt = (
             "You are a helpful assistant. The user asked a question, but the PDFs did not yield relevant context.\n\n"
             f"QUESTION:\n{question}\n\n"
             "Explain that the PDFs did not contain enough information."
         )
+    return prompt
+
+
+def answer_question_multi_pdf(
+    store: VectorStore,
+    question: str,
+    top_k: int = 5,
+    search_mode: str = "dense",
+) -> str:
+    """
+    Same as single-PDF RAG, but using the multi-PDF vector store.
+    """
+    from modules.embedder import embed_texts
+
+    print(f"❓ User question: {question}")
+
+    # 1) Embed question
+    q_emb = embed_texts([question])
+    q_vec = q_emb[0]
+
+    # 2) Search in FAISS + build prompt
+    prompt = build_rag_prompt(store, question, q_vec, top_k=top_k, search_mode=search_mode)
 
     print("🤖 Sending prompt to local LLM...")
     answer = generate_answer(prompt, max_new_tokens=256)
@@ -114,6 +182,35 @@ def answer_question_multi_pdf(
     return answer
 
 
+def answer_questions_multi_pdf(
+    store: VectorStore,
+    questions: List[str],
+    top_k: int = 5,
+    batch_size: int = 8,
+    decoding: str = "greedy",
+    search_mode: str = "dense",
+) -> List[str]:
+    """
+    Bulk version of answer_question_multi_pdf for question sets:
+    embeds all questions in one call and generates answers in padded batches.
+    """
+    if not questions:
+        return []
+
+    print(f"❓ Answering {len(questions)} questions in bulk...")
+    q_embs = embed_texts(questions)
+
+    prompts = [
+        build_rag_prompt(store, question, q_vec, top_k=top_k, search_mode=search_mode)
+        for question, q_vec in zip(questions, q_embs)
+    ]
+
+    print(f"🤖 Sending {len(prompts)} prompts to local LLM (batch_size={batch_size})...")
+    answers = generate_answers(prompts, max_new_tokens=256, batch_size=batch_size, decoding=decoding)
+    print("✅ Got all answers from LLM")
+    return answers
+
+
 if __name__ == "__main__":
     # Small end-to-end test
     folder = r"C:\local_ai\data"
@@ -1,6 +1,6 @@
 import os
 import sys
-from typing import List, Tuple
+from typing import List, Optional, Tuple, Union
 
 import numpy as np
 
@@ -10,9 +10,13 @@ if PROJECT_ROOT not in sys.path:
     sys.path.append(PROJECT_ROOT)
 
 from modules.multi_pdf_loader import load_multiple_pdfs
+from modules.pdf_corpus import load_multiple_pdfs_from_corpus
 from modules.text_splitter import split_text_into_chunks
 from modules.embedder import embed_texts
+from modules.parallel_embedder import embed_texts_parallel
 from modules.vector_store import VectorStore
+from modules.sharded_store import ShardedVectorStore
+from modules.rag_context import format_context_text
 from modules.local_llm_gguf import generate_answer as gguf_generate_answer
 
 
@@ -20,17 +24,25 @@ def build_vector_store_from_folder_gguf(
     folder_path: str,
     chunk_size: int = 800,
     chunk_overlap: int = 200,
-) -> Tuple[VectorStore, List[str]]:
+    num_workers: int = 1,
+    num_shards: int = 1,
+    corpus_dir: Optional[str] = None,
+) -> Tuple[Union[VectorStore, ShardedVectorStore], List[str]]:
     """
     Same as build_vector_store_from_folder, but named for clarity.
-    1. Load ALL PDFs in folder
+    1. Load ALL PDFs in folder (from the extracted-page corpus if corpus_dir is set)
     2. Split into chunks
-    3. Embed
-    4. Build FAISS index
+    3. Embed (num_workers > 1 shards embedding across processes)
+    4. Build FAISS index (num_shards > 1 splits it across shard processes)
+       A ShardedVectorStore only supports search() (no search_batch, save or publish_store)
     """
     print(f"📁 [GGUF] Building multi-PDF vector store from folder: {folder_path}")
 
-    pdf_texts = load_multiple_pdfs(folder_path)
+    if corpus_dir:
+        # Pages extracted once and kept on disk: re-chunking skips PDF parsing
+        pdf_texts = load_multiple_pdfs_from_corpus(folder_path, corpus_dir)
+    else:
+        pdf_texts = load_multiple_pdfs(folder_path)
 
     if not pdf_texts:
         raise ValueError("No valid PDFs with extractable text found.")
@@ -46,49 +58,55 @@ def build_vector_store_from_folder_gguf(
     print(f"✅ [GGUF] Total chunks from all PDFs: {len(all_chunks)}")
 
     print("🧮 [GGUF] Embedding all chunks...")
-    embeddings = embed_texts(all_chunks)
+    if num_workers > 1:
+        embeddings = embed_texts_parallel(all_chunks, num_workers=num_workers)
+    else:
+        embeddings = embed_texts(all_chunks)
     print(f"✅ [GGUF] Embeddings shape: {embeddings.shape}")
 
     dim = embeddings.shape[1]
-    store = VectorStore(dim=dim)
+    if num_shards > 1:
+        print(f"🧩 [GGUF] Starting {num_shards} shard processes...")
+        store = ShardedVectorStore(dim=dim, num_shards=num_shards)
+    else:
+        store = VectorStore(dim=dim)
 
     print("📦 [GGUF] Adding embeddings to vector store...")
     store.add_embeddings(embeddings, all_chunks)
+
+    print("🔎 [GGUF] Building BM25 lexical index...")
+    store.build_lexical_index()
     print("✅ [GGUF] Multi-PDF vector store ready")
 
     return store, all_chunks
 
 
-def answer_question_multi_pdf_gguf(
+def build_context_text_gguf(
     store: VectorStore,
     question: str,
+    q_vec: np.ndarray,
     top_k: int = 5,
+    search_mode: str = "dense",
 ) -> str:
     """
-    Multi-PDF RAG answerer, but uses local GGUF LLaMA instead of Flan-T5.
+    Search the store with an already-embedded question and format the hits as PDF context.
     """
-    from modules.embedder import embed_texts
-
-    print(f"❓ [GGUF] User question: {question}")
-
-    # 1) Embed question
-    q_emb = embed_texts([question])
-    q_vec = q_emb[0]
-
-    # 2) Search in FAISS
-    results = store.search(q_vec, top_k=top_k)
+    # Search in FAISS (optionally fused with BM25, see VectorStore.search)
+    results = store.search(q_vec, top_k=top_k, query_text=question, mode=search_mode)
 
     if not results:
         print("⚠️ [GGUF] No similar chunks found.")
-        context_text = ""
     else:
         print(f"📚 [GGUF] Top {len(results)} chunks retrieved from ALL PDFs:")
-        context_parts = []
         for i, (chunk, score) in enumerate(results, start=1):
             print(f"  - Chunk {i}, score={score:.3f}, length={len(chunk)}")
-            context_parts.append(f"[Chunk {i}, score={score:.3f}]\n{chunk}\n")
-        context_text = "\n".join(context_parts)
+    return format_context_text(results)
 
+
+def format_rag_prompt_gguf(question: str, context_text: str) -> str:
+    """
+    Build the GGUF prompt from a question and its formatted PDF context.
+    """
     if context_text.strip():
         prompt = (
             "You are a helpful assistant. Use ONLY the following PDF context (from multiple documents) "
@@ -105,6 +123,43 @@ def answer_question_multi_pdf_gguf(
             f"QUESTION:\n{question}\n\n"
             "Explain clearly that the PDFs did not contain enough information."
         )
+    return prompt
+
+
+def build_rag_prompt_gguf(
+    store: VectorStore,
+    question: str,
+    q_vec: np.ndarray,
+    top_k: int = 5,
+    search_mode: str = "dense",
+) -> str:
+    """
+    Search the store with an already-embedded question and build the GGUF prompt.
+    """
+    context_text = build_context_text_gguf(store, question, q_vec, top_k=top_k, search_mode=search_mode)
+    return format_rag_prompt_gguf(question, context_text)
+
+
+def answer_question_multi_pdf_gguf(
+    store: VectorStore,
+    question: str,
+    top_k: int = 5,
+    search_mode: str = "dense",
+) -> str:
+    """
+    Multi-PDF RAG answerer, but uses local GGUF LLaMA instead of Flan-T5.
+    search_mode: "dense", "hybrid" or "prefilter" (BM25 first stage), see VectorStore.search.
+    """
+    from modules.embedder import embed_texts
+
+    print(f"❓ [GGUF] User question: {question}")
+
+    # 1) Embed question
+    q_emb = embed_texts([question])
+    q_vec = q_emb[0]
+
+    # 2) Search in FAISS + build prompt
+    prompt = build_rag_prompt_gguf(store, question, q_vec, top_k=top_k, search_mode=search_mode)
 
     print("🤖 [GGUF] Sending prompt to local GGUF LLaMA...")
     answer = gguf_generate_answer(prompt, max_tokens=256)
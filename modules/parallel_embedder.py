@@ -0,0 +1,137 @@
+import os
+import sys
+import time
+import multiprocessing as mp
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+# 🔧 Make sure project root (C:\local_ai) is on sys.path (also needed inside spawned workers)
+PROJECT_ROOT = os.path.dirname(os.path.dirname(__file__))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+
+from modules import embedder
+
+# Texts per task sent to a worker. Bigger = less IPC overhead, smaller = smoother streaming.
+SHARD_BATCH_SIZE = 256
+
+
+def _init_worker(backend: Optional[str], threads_per_worker: int):
+    """
+    Runs once in every worker process: pin torch threads and load a private model copy.
+    """
+    try:
+        import torch
+
+        torch.set_num_threads(threads_per_worker)
+    except ImportError:
+        pass
+    # ONNX sessions take their thread count from here when they are created
+    embedder.EMBED_NUM_THREADS = threads_per_worker
+    embedder.load_embedder(backend)
+
+
+def _embed_batch(task: Tuple[int, List[str], Optional[str], int]) -> Tuple[int, int, np.ndarray, float]:
+    """
+    Worker task: embed one batch. Returns (batch_no, worker_pid, vectors, seconds).
+    """
+    batch_no, texts, backend, batch_size = task
+    start = time.perf_counter()
+    vectors = embedder.embed_texts(texts, batch_size=batch_size, backend=backend)
+    return batch_no, os.getpid(), vectors, time.perf_counter() - start
+
+
+def iter_embeddings_parallel(
+    texts: List[str],
+    num_workers: int = 2,
+    backend: Optional[str] = None,
+    batch_size: Optional[int] = None,
+    shard_batch_size: int = SHARD_BATCH_SIZE,
+    stats: Optional[Dict[int, List[float]]] = None,
+) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+    """
+    Embed texts across `num_workers` processes, each holding its own model copy.
+
+    Texts are sorted by length first so every batch has similar lengths (less padding),
+    then cut into shards of `shard_batch_size`. Yields (original_indices, vectors) per shard,
+    in shard order, as soon as each shard is ready.
+    If `stats` is given it is filled with {worker_pid: [n_texts, seconds]}.
+    """
+    if not texts:
+        return
+
+    order = np.argsort([len(t) for t in texts], kind="stable")
+    shards = [order[i:i + shard_batch_size] for i in range(0, len(order), shard_batch_size)]
+
+    threads_per_worker = max(1, (os.cpu_count() or 1) // num_workers)
+    batch_size = batch_size or embedder.EMBED_BATCH_SIZE
+    # Resolve here: spawned workers re-import embedder and would only see its file defaults,
+    # not an EMBEDDER_BACKEND changed at runtime in this process
+    backend = backend or embedder.EMBEDDER_BACKEND
+
+    def tasks():
+        for batch_no, idx in enumerate(shards):
+            yield batch_no, [texts[i] for i in idx], backend, batch_size
+
+    ctx = mp.get_context("spawn")  # safe with torch and on Windows
+    with ctx.Pool(
+        processes=num_workers,
+        initializer=_init_worker,
+        initargs=(backend, threads_per_worker),
+    ) as pool:
+        for batch_no, pid, vectors, seconds in pool.imap(_embed_batch, tasks()):
+            if stats is not None:
+                entry = stats.setdefault(pid, [0, 0.0])
+                entry[0] += len(vectors)
+                entry[1] += seconds
+            yield shards[batch_no], vectors
+
+
+def embed_texts_parallel(
+    texts: List[str],
+    num_workers: int = 2,
+    backend: Optional[str] = None,
+    batch_size: Optional[int] = None,
+    shard_batch_size: int = SHARD_BATCH_SIZE,
+) -> np.ndarray:
+    """
+    Multi-process version of embedder.embed_texts: same input, same output order.
+    Prints embeddings/sec for every worker.
+    """
+    if not texts:
+        return np.zeros((0, embedder.EMBEDDING_DIM), dtype="float32")
+
+    print(f"🧮 Embedding {len(texts)} texts with {num_workers} worker processes...")
+    stats: Dict[int, List[float]] = {}
+    out: Optional[np.ndarray] = None
+    start = time.perf_counter()
+
+    for indices, vectors in iter_embeddings_parallel(
+        texts,
+        num_workers=num_workers,
+        backend=backend,
+        batch_size=batch_size,
+        shard_batch_size=shard_batch_size,
+        stats=stats,
+    ):
+        if out is None:
+            out = np.empty((len(texts), vectors.shape[1]), dtype="float32")
+        out[indices] = vectors
+
+    elapsed = time.perf_counter() - start
+    for pid, (count, seconds) in sorted(stats.items()):
+        rate = count / seconds if seconds > 0 else 0.0
+        print(f"   ➜ worker {pid}: {int(count)} embeddings, {rate:.1f} emb/s")
+    print(f"✅ Parallel embedding done: {len(texts) / elapsed:.1f} emb/s overall")
+    return out
+
+
+if __name__ == "__main__":
+    sample_texts = [
+        "Machine learning is a subset of artificial intelligence.",
+        "Cats are cute animals.",
+        "FAISS makes vector search fast.",
+    ] * 400
+    vecs = embed_texts_parallel(sample_texts, num_workers=2)
+    print(f"Embeddings shape: {vecs.shape}")
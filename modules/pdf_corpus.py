@@ -0,0 +1,185 @@
+import os
+import sys
+import json
+import mmap
+import time
+import shutil
+import hashlib
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+# 🔧 Make sure Python can find the project root (C:\local_ai)
+PROJECT_ROOT = os.path.dirname(os.path.dirname(__file__))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+
+from modules.pdf_loader import PageExtractor, load_pdf_pages
+
+# Layout of a corpus folder (one sub-folder per distinct PDF content):
+#   <sha256>/pages.bin        utf-8 text of all pages joined with "\n" (== load_pdf_text output)
+#   <sha256>/page_spans.npy   int64 (n_pages, 2): byte [start, end) of every page in pages.bin
+#   <sha256>/meta.json        {"file": ..., "pages": ..., "bytes": ...}
+# Renaming or moving a PDF keeps its cache entry; changing its content makes a new one.
+DEFAULT_CORPUS_DIR = os.path.join(PROJECT_ROOT, "cache", "corpus")
+
+
+def file_sha256(path: str, block_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class CorpusDocument:
+    """
+    Read-only view of one extracted PDF. Text is memory-mapped; pages are decoded
+    straight from the mapped bytes, nothing is re-parsed.
+    """
+
+    def __init__(self, folder: str):
+        self.spans = np.load(os.path.join(folder, "page_spans.npy"), mmap_mode="r")
+        self._file = open(os.path.join(folder, "pages.bin"), "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        self._view = memoryview(self._mmap) if size else memoryview(b"")
+
+    def __len__(self) -> int:
+        return len(self.spans)
+
+    def page(self, page_no: int) -> str:
+        start, end = self.spans[page_no]
+        return str(self._view[int(start):int(end)], "utf-8")
+
+    def iter_pages(self) -> Iterator[str]:
+        for page_no in range(len(self)):
+            yield self.page(page_no)
+
+    def text(self) -> str:
+        # Pages are stored joined with "\n", so the full text is the whole file
+        return str(self._view, "utf-8")
+
+    def close(self):
+        self._view.release()
+        if self._mmap is not None:
+            self._mmap.close()
+        self._file.close()
+
+
+class PdfCorpus:
+    """
+    Persistent per-page store of extracted PDF text, keyed by file hash and page number.
+    Extraction with pypdf happens once per distinct PDF; later chunking/embedding runs
+    read the stored pages instead.
+    """
+
+    def __init__(self, corpus_dir: str = DEFAULT_CORPUS_DIR):
+        self.corpus_dir = corpus_dir
+        os.makedirs(corpus_dir, exist_ok=True)
+
+    def _folder(self, file_hash: str) -> str:
+        return os.path.join(self.corpus_dir, file_hash)
+
+    def has(self, file_hash: str) -> bool:
+        return os.path.exists(os.path.join(self._folder(file_hash), "meta.json"))
+
+    def add_pages(self, file_hash: str, pages: List[str], file_name: str = ""):
+        """
+        Store extracted pages (written to a temp folder, then renamed into place).
+        """
+        encoded = [p.encode("utf-8") for p in pages]
+        spans = np.zeros((len(encoded), 2), dtype="int64")
+        pos = 0
+        for i, b in enumerate(encoded):
+            spans[i] = (pos, pos + len(b))
+            pos += len(b) + 1  # "\n" separator
+
+        tmp = self._folder(file_hash) + f".tmp-{os.getpid()}"
+        os.makedirs(tmp, exist_ok=True)
+        with open(os.path.join(tmp, "pages.bin"), "wb") as f:
+            f.write(b"\n".join(encoded))
+        np.save(os.path.join(tmp, "page_spans.npy"), spans)
+        with open(os.path.join(tmp, "meta.json"), "w", encoding="utf-8") as f:
+            json.dump({"file": file_name, "pages": len(pages), "bytes": max(0, pos - 1)}, f)
+
+        if self.has(file_hash):  # another process got there first
+            shutil.rmtree(tmp, ignore_errors=True)
+            return
+        os.replace(tmp, self._folder(file_hash))
+
+    def ensure(self, pdf_path: str, extractor: Optional[PageExtractor] = None) -> Tuple[str, Optional[List[str]]]:
+        """
+        Extract `pdf_path` into the corpus unless its content is already there.
+        Returns (file hash, pages): pages is None when they are in the corpus, or the
+        freshly extracted pages when some could not be read. Incomplete extractions
+        (skipped pages, PDF that failed to open) are not stored, so the next run retries them.
+        `extractor` lets a folder ingest share one page worker process across PDFs.
+        """
+        file_hash = file_sha256(pdf_path)
+        if self.has(file_hash):
+            print(f"⚡ Using cached pages for {os.path.basename(pdf_path)} ({file_hash[:12]})")
+            return file_hash, None
+
+        pages, report = load_pdf_pages(pdf_path, extractor=extractor)
+        if not report.complete:
+            print(f"⚠️ Not caching {os.path.basename(pdf_path)}: {report.summary()}")
+            return file_hash, pages
+        self.add_pages(file_hash, pages, file_name=os.path.basename(pdf_path))
+        return file_hash, None
+
+    def open(self, file_hash: str) -> CorpusDocument:
+        if not self.has(file_hash):
+            raise KeyError(f"PDF {file_hash} not in corpus {self.corpus_dir}")
+        return CorpusDocument(self._folder(file_hash))
+
+    def load_text(self, pdf_path: str, extractor: Optional[PageExtractor] = None) -> str:
+        """
+        Drop-in for pdf_loader.load_pdf_text that extracts only on the first call.
+        """
+        file_hash, pages = self.ensure(pdf_path, extractor=extractor)
+        if pages is not None:
+            return "\n".join(pages)
+        document = self.open(file_hash)
+        try:
+            return document.text()
+        finally:
+            document.close()
+
+
+def load_multiple_pdfs_from_corpus(folder_path: str, corpus_dir: Optional[str] = None) -> Dict[str, str]:
+    """
+    Same result as multi_pdf_loader.load_multiple_pdfs ({filename: full_text}), but pages
+    come from the persistent corpus, so only new or changed PDFs are parsed.
+    """
+    if not os.path.exists(folder_path):
+        raise FileNotFoundError(f"Folder not found: {folder_path}")
+
+    corpus = PdfCorpus(corpus_dir or DEFAULT_CORPUS_DIR)
+    pdf_texts: Dict[str, str] = {}
+
+    # One page worker process for the folder, started only if some PDF needs extracting
+    with PageExtractor() as extractor:
+        for file in os.listdir(folder_path):
+            if not file.lower().endswith(".pdf"):
+                continue
+
+            text = corpus.load_text(os.path.join(folder_path, file), extractor=extractor)
+            if not text.strip():
+                print(f"⚠️ {file} has no extractable text, skipping.")
+                continue
+
+            pdf_texts[file] = text
+            print(f"   ➜ Loaded {len(text)} characters from {file}")
+
+    if not pdf_texts:
+        print("⚠️ No valid PDFs with text found in this folder.")
+    return pdf_texts
+
+
+if __name__ == "__main__":
+    folder = r"C:\local_ai\data"
+    for attempt in ("first run (extracts)", "second run (cached)"):
+        start = time.perf_counter()
+        texts = load_multiple_pdfs_from_corpus(folder)
+        print(f"⏱️ {attempt}: {len(texts)} PDFs in {time.perf_counter() - start:.2f}s")
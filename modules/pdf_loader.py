@@ -1,13 +1,231 @@
 import os
-from typing import List
+import time
+import multiprocessing as mp
+from typing import Dict, Iterator, List, Optional, Tuple
 from pypdf import PdfReader
+from pypdf.generic import ArrayObject
 
+# Per-page limits so one pathological page can't stall the whole ingest
+# Seconds per page, enforced by extracting in a PageExtractor child process
+# (None = extract in-process with no time limit)
+PAGE_TIMEOUT_S: Optional[float] = 60.0
+MAX_CONTENT_BYTES: Optional[int] = 20 * 1024 * 1024  # raw (still encoded) content stream size per page
+MAX_PAGE_CHARS: Optional[int] = 200_000  # longer page text is truncated
+DEFER_TIMEOUT_FACTOR = 4.0  # deferred pages get this many times the normal timeout
+OPEN_TIMEOUT_S = 120.0  # time allowed for the page worker to start and open a PDF
 
-def load_pdf_text(file_path: str) -> str:
+
+class PageReport:
     """
-    Read a single PDF file and return its full text as one big string.
-    Adds debug checks for corrupted/non-PDF files.
+    What happened while reading one PDF: pages read, and pages skipped/deferred/truncated with reasons.
+    """
+
+    def __init__(self, file_path: str):
+        self.file_path = file_path
+        self.num_pages = 0
+        self.pages_read = 0
+        self.skipped: List[Tuple[int, str]] = []
+        self.deferred: List[Tuple[int, str]] = []
+        self.truncated: List[int] = []
+        self.error: Optional[str] = None  # the PDF could not be opened at all
+
+    @property
+    def complete(self) -> bool:
+        """
+        True if every page was read (deferred pages that were read on retry count as read).
+        """
+        return self.error is None and not self.skipped
+
+    def summary(self) -> str:
+        if self.error is not None:
+            return f"could not open ({self.error})"
+        parts = [f"{self.pages_read}/{self.num_pages} pages read"]
+        if self.skipped:
+            parts.append("skipped " + ", ".join(f"p{i} ({why})" for i, why in self.skipped))
+        if self.deferred:
+            parts.append("deferred " + ", ".join(f"p{i} ({why})" for i, why in self.deferred))
+        if self.truncated:
+            parts.append(f"truncated {len(self.truncated)} page(s)")
+        return "; ".join(parts)
+
+
+def _content_size(page) -> int:
+    """
+    Raw size of a page's content streams, from /Length (nothing is decoded).
+    """
+    contents = page.get("/Contents")
+    if contents is None:
+        return 0
+    contents = contents.get_object()
+    streams = contents if isinstance(contents, ArrayObject) else [contents]
+    size = 0
+    for stream in streams:
+        stream = stream.get_object()
+        length = stream.get("/Length")
+        if length is not None:
+            size += int(length.get_object())
+        else:  # streams built in memory have no /Length yet
+            size += len(getattr(stream, "_data", b"") or b"")
+    return size
+
+
+def _extract_page(reader: PdfReader, page_no: int, max_content_bytes: Optional[int]) -> Tuple[str, str]:
+    """
+    Returns (status, text_or_reason) with status "ok", "too_large" or "error".
+    """
+    try:
+        page = reader.pages[page_no]
+        if max_content_bytes is not None:
+            size = _content_size(page)
+            if size > max_content_bytes:
+                return "too_large", f"content stream {size} bytes"
+        return "ok", page.extract_text() or ""
+    except Exception as e:
+        return "error", repr(e)
+
+
+def _page_worker(conn):
+    """
+    Runs in a child process: opens PDFs and extracts their pages on request.
+    Requests: ("open", file_path) -> number of pages or error text,
+    ("page", page_no, max_content_bytes) -> _extract_page() result, None -> exit.
+    """
+    reader = None
+    while True:
+        try:
+            request = conn.recv()
+        except EOFError:
+            return
+        if request is None:
+            return
+        if request[0] == "open":
+            try:
+                reader = PdfReader(request[1])
+                conn.send(len(reader.pages))
+            except Exception as e:
+                reader = None
+                conn.send(repr(e))
+        else:
+            _, page_no, max_content_bytes = request
+            conn.send(_extract_page(reader, page_no, max_content_bytes))
+
+
+class PageExtractor:
+    """
+    Extracts pages in a long-lived child process so a page that hangs can be killed after a timeout.
+
+    One extractor reads any number of PDFs (open() each in turn), so a folder ingest starts
+    the worker once; it is only restarted after a timeout or a crash. Use it as a context
+    manager (or call stop()) and pass it to iter_pdf_pages / load_pdf_pages / load_pdf_text.
+    """
+
+    def __init__(self):
+        self.process = None
+        self.conn = None
+        self.file_path: Optional[str] = None  # PDF currently open in the worker
+        self.failed: Optional[str] = None  # set when a restart failed; later pages of this PDF are skipped
+
+    def __enter__(self) -> "PageExtractor":
+        return self
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _start(self):
+        ctx = mp.get_context("spawn")
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_page_worker, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+
+    def open(self, file_path: str, timeout: float = OPEN_TIMEOUT_S) -> int:
+        """
+        Open a PDF in the worker (starting it if needed) and return its number of pages.
+        """
+        self.failed = None
+        if self.process is None:
+            self._start()
+        self.conn.send(("open", file_path))
+        if not self._wait(timeout):
+            self.stop()
+            raise RuntimeError(f"page worker did not open the PDF within {timeout:.0f}s")
+        result = self.conn.recv()
+        if isinstance(result, str):
+            raise ValueError(result)
+        self.file_path = file_path
+        return result
+
+    def _wait(self, timeout: float) -> bool:
+        """
+        Wait for a reply; False on timeout or if the worker died (e.g. crashed on a page).
+        """
+        deadline = time.monotonic() + timeout
+        while True:
+            remaining = deadline - time.monotonic()
+            if self.conn.poll(max(0.0, min(0.5, remaining))):
+                return True
+            if remaining <= 0 or not self.process.is_alive():
+                return False
+
+    def extract(self, page_no: int, timeout: float, max_content_bytes: Optional[int]) -> Tuple[str, str]:
+        if self.failed is not None:
+            return "error", self.failed
+        if self.process is None:
+            # Killed after a stuck page or a crash: start a fresh worker on the same PDF
+            try:
+                self.open(self.file_path)
+            except Exception as e:
+                self.failed = f"page worker restart failed: {e!r}"
+                return "error", self.failed
+        self.conn.send(("page", page_no, max_content_bytes))
+        if self._wait(timeout):
+            return self.conn.recv()
+        reason = f"no result after {timeout:.0f}s" if self.process.is_alive() else "worker crashed"
+        self.stop()
+        return "timeout", reason
+
+    def stop(self):
+        if self.process is not None and self.process.is_alive():
+            try:
+                self.conn.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+            self.process.join(timeout=1)
+            if self.process.is_alive():
+                self.process.kill()
+        if self.conn is not None:
+            self.conn.close()
+        self.process = None
+        self.conn = None
+
+
+def iter_pdf_pages(
+    file_path: str,
+    max_pages: Optional[int] = None,
+    page_timeout: Optional[float] = PAGE_TIMEOUT_S,
+    max_content_bytes: Optional[int] = MAX_CONTENT_BYTES,
+    max_page_chars: Optional[int] = MAX_PAGE_CHARS,
+    on_limit: str = "skip",
+    report: Optional[PageReport] = None,
+    extractor: Optional[PageExtractor] = None,
+) -> Iterator[Tuple[int, str]]:
     """
+    Lazily yield (page_no, text) for a PDF, one page at a time.
+
+    - max_pages: stop after the first N pages (e.g. for a quick preview index)
+    - page_timeout: seconds per page (extraction runs in a child process that is killed on timeout);
+      None extracts in-process with no time limit
+    - max_content_bytes / max_page_chars: skip pages with huge content streams / truncate huge text
+    - on_limit: "skip" drops offending pages, "defer" retries them at the end with a
+      longer timeout and no size limit (deferred pages are yielded last)
+    - report: optional PageReport filled with what was read, skipped or deferred
+    - extractor: PageExtractor to reuse across PDFs (otherwise one is started for this PDF)
+    Callers can also simply stop iterating early.
+    """
+    if on_limit not in ("skip", "defer"):
+        raise ValueError("on_limit must be 'skip' or 'defer'")
+    report = report if report is not None else PageReport(file_path)
+
     print(f"🔍 Trying to read PDF: {file_path}")
 
     if not os.path.exists(file_path):
@@ -21,26 +239,98 @@ def load_pdf_text(file_path: str) -> str:
     # Basic PDF validation
     if not header.startswith(b"%PDF-"):
         print("❌ Not a valid PDF — header must start with %PDF-")
-        return ""
+        return
 
     # Try loading the PDF
+    own_extractor = page_timeout is not None and extractor is None
+    if page_timeout is None:
+        extractor = None
+    elif own_extractor:
+        extractor = PageExtractor()
     try:
-        reader = PdfReader(file_path)
+        if extractor is None:
+            reader = PdfReader(file_path)
+            num_pages = len(reader.pages)
+        else:
+            num_pages = extractor.open(file_path)
     except Exception as e:
         print(f"❌ Error opening PDF: {e}")
-        return ""
+        report.error = repr(e)
+        if own_extractor:
+            extractor.stop()
+        return
 
-    pages_text: List[str] = []
+    def extract(page_no: int, timeout: Optional[float], size_limit: Optional[int]) -> Tuple[str, str]:
+        if extractor is None:
+            return _extract_page(reader, page_no, size_limit)
+        return extractor.extract(page_no, timeout, size_limit)
 
-    for i, page in enumerate(reader.pages):
-        try:
-            text = page.extract_text() or ""
-        except Exception as e:
-            print(f"⚠️ Error reading page {i}: {e}")
-            text = ""
-        pages_text.append(text)
+    def finish(page_no: int, text: str) -> Tuple[int, str]:
+        if max_page_chars is not None and len(text) > max_page_chars:
+            report.truncated.append(page_no)
+            text = text[:max_page_chars]
+        report.pages_read += 1
+        return page_no, text
+
+    if max_pages is not None:
+        num_pages = min(num_pages, max_pages)
+    report.num_pages = num_pages
+    retry: List[int] = []
+
+    try:
+        for page_no in range(num_pages):
+            status, value = extract(page_no, page_timeout, max_content_bytes)
+            if status == "ok":
+                yield finish(page_no, value)
+            elif status == "error":
+                print(f"⚠️ Error reading page {page_no}: {value}")
+                report.skipped.append((page_no, value))
+            elif on_limit == "defer":
+                report.deferred.append((page_no, value))
+                retry.append(page_no)
+            else:
+                print(f"⚠️ Skipping page {page_no}: {value}")
+                report.skipped.append((page_no, value))
+
+        for page_no in retry:
+            timeout = page_timeout * DEFER_TIMEOUT_FACTOR if page_timeout is not None else None
+            status, value = extract(page_no, timeout, None)
+            if status == "ok":
+                yield finish(page_no, value)
+            else:
+                print(f"⚠️ Skipping deferred page {page_no}: {value}")
+                report.skipped.append((page_no, value))
+    finally:
+        if own_extractor:
+            extractor.stop()
+        if report.skipped or report.deferred or report.truncated:
+            print(f"📋 {os.path.basename(file_path)}: {report.summary()}")
+
+
+def load_pdf_pages(file_path: str, max_pages: Optional[int] = None, **limits) -> Tuple[List[str], PageReport]:
+    """
+    Read a single PDF file and return the text of every page (one string per page)
+    plus the PageReport of what was skipped or truncated.
+    Adds debug checks for corrupted/non-PDF files; returns [] if the file can't be read.
+    Skipped pages come back as "" so list positions still match page numbers;
+    check report.complete before treating the pages as the whole document.
+    Extra keyword arguments are passed to iter_pdf_pages (timeouts, size limits, on_limit, extractor).
+    """
+    report = PageReport(file_path)
+    pages: Dict[int, str] = dict(iter_pdf_pages(file_path, max_pages=max_pages, report=report, **limits))
+    if not pages:
+        return [], report
+    return [pages.get(i, "") for i in range(report.num_pages)], report
 
-    full_text = "\n".join(pages_text)
+
+def load_pdf_text(file_path: str, extractor: Optional[PageExtractor] = None) -> str:
+    """
+    Read a single PDF file and return its full text as one big string.
+    Adds debug checks for corrupted/non-PDF files.
+    Pass a PageExtractor when reading many PDFs so they share one worker process.
+    """
+    pages, _ = load_pdf_pages(file_path, extractor=extractor)
+    full_text = "\n".join(pages)
     print(f"✅ Finished reading PDF. Total characters: {len(full_text)}")
     return full_text
 
@@ -0,0 +1,17 @@
+from typing import List, Tuple
+
+# Prompt context formatting shared by the T5 and GGUF pipelines and batch_qa.
+# Kept free of model imports so tools can format prompts without llama_cpp / transformers.
+
+
+def format_context_text(results: List[Tuple[str, float]], include_scores: bool = True) -> str:
+    """
+    Format retrieved (chunk, score) pairs as the PDF CONTEXT block of the prompt.
+    include_scores=False leaves the scores out of the chunk headers, so questions that
+    retrieved the same chunks get byte-identical context (a shared, reusable prompt prefix).
+    """
+    context_parts = []
+    for i, (chunk, score) in enumerate(results, start=1):
+        header = f"[Chunk {i}, score={score:.3f}]" if include_scores else f"[Chunk {i}]"
+        context_parts.append(f"{header}\n{chunk}\n")
+    return "\n".join(context_parts)
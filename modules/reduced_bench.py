@@ -0,0 +1,109 @@
+import os
+import sys
+import time
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+# 🔧 Ensure project root (C:\local_ai) is on sys.path
+PROJECT_ROOT = os.path.dirname(os.path.dirname(__file__))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+
+from modules.vector_store import RERANK_CANDIDATES, VectorStore
+
+
+def _timed_search(store: VectorStore, queries: np.ndarray, top_k: int):
+    latencies = []
+    ids = []
+    for q in queries:
+        start = time.perf_counter()
+        _, row = store._search_ids(q.reshape(1, -1), top_k)
+        latencies.append(time.perf_counter() - start)
+        ids.append(row[0])
+    return np.array(latencies) * 1000, np.array(ids)
+
+
+def benchmark_reduced(
+    store: VectorStore,
+    queries: np.ndarray,
+    dims: Sequence[int] = (64, 128, 192),
+    method: str = "pca",
+    top_k: int = 5,
+    candidates: int = RERANK_CANDIDATES,
+) -> Dict[str, Dict[str, float]]:
+    """
+    Compare exact full-dimension search with two-stage search at several reduced dims.
+    Reports per-query latency, recall@top_k against the exact results and the memory
+    of the vectors scanned in the first pass. The store's own reduced index is restored afterwards.
+    """
+    norms = np.linalg.norm(queries, axis=1, keepdims=True) + 1e-10
+    queries = (queries / norms).astype("float32")
+    saved = store.reduced_index, store.rerank_candidates
+
+    store.reduced_index = None
+    exact_ms, exact_ids = _timed_search(store, queries, top_k)
+    full_mb = store.index.ntotal * store.dim * 4 / 1e6
+    results = {
+        f"full ({store.dim}d)": {
+            "p50_ms": float(np.percentile(exact_ms, 50)),
+            "p95_ms": float(np.percentile(exact_ms, 95)),
+            "recall": 1.0,
+            "scan_mb": full_mb,
+        }
+    }
+
+    try:
+        for dim in dims:
+            start = time.perf_counter()
+            store.build_reduced_index(reduced_dim=dim, method=method, candidates=candidates)
+            build_s = time.perf_counter() - start
+            ms, ids = _timed_search(store, queries, top_k)
+            hits = [len(set(a.tolist()) & set(b.tolist()) - {-1}) for a, b in zip(ids, exact_ids)]
+            expected = [len(set(b.tolist()) - {-1}) or 1 for b in exact_ids]
+            results[f"{method} {dim}d"] = {
+                "p50_ms": float(np.percentile(ms, 50)),
+                "p95_ms": float(np.percentile(ms, 95)),
+                "recall": float(np.sum(hits) / np.sum(expected)),
+                "scan_mb": store.reduced_index.nbytes / 1e6,
+                "build_s": build_s,
+            }
+    finally:
+        store.reduced_index, store.rerank_candidates = saved
+
+    print(f"\n📊 Two-stage search ({store.index.ntotal} chunks, {len(queries)} queries, "
+          f"top-{top_k}, re-rank {candidates}):")
+    for name, stats in results.items():
+        print(
+            f"  - {name:12s} p50={stats['p50_ms']:.3f} ms  p95={stats['p95_ms']:.3f} ms  "
+            f"recall@{top_k}={stats['recall']:.3f}  first-pass vectors={stats['scan_mb']:.1f} MB"
+        )
+    return results
+
+
+def sample_queries(store: VectorStore, questions: List[str], num_chunk_queries: int = 200, seed: int = 0) -> np.ndarray:
+    """
+    Embedded questions plus noisy copies of random stored chunks (enough queries for a stable recall).
+    """
+    from modules.embedder import embed_texts
+
+    rng = np.random.default_rng(seed)
+    ids = rng.choice(store.index.ntotal, size=min(num_chunk_queries, store.index.ntotal), replace=False)
+    chunk_vecs = store.index.reconstruct_batch(ids.astype("int64"))
+    chunk_vecs = chunk_vecs + rng.normal(scale=0.05, size=chunk_vecs.shape).astype("float32")
+    return np.vstack([embed_texts(questions), chunk_vecs]).astype("float32")
+
+
+if __name__ == "__main__":
+    from modules.multi_rag_gguf import build_vector_store_from_folder_gguf
+
+    folder = sys.argv[1] if len(sys.argv) > 1 else r"C:\local_ai\data"
+    store, _ = build_vector_store_from_folder_gguf(folder)
+    questions = [
+        "What is the main topic across these documents?",
+        "Summarize the key definitions mentioned in the documents.",
+        "Which requirements or steps are listed?",
+    ]
+    queries = sample_queries(store, questions)
+    dims = [d for d in (32, 64, 128, 192) if d <= min(store.dim, store.index.ntotal)]
+    benchmark_reduced(store, queries, dims=dims, method="pca")
@@ -0,0 +1,99 @@
+import os
+import json
+from typing import Optional
+
+import faiss
+import numpy as np
+
+REDUCTION_METHODS = ("pca", "truncate")
+
+
+class ReducedIndex:
+    """
+    Low-dimensional copy of the store's vectors for a fast first search pass:
+    - train() fits the projection (PCA, or plain truncation to the first dims)
+    - add() projects and stores vectors (ids = insertion order, same as VectorStore)
+    - search() returns candidate ids to be re-ranked with the full vectors
+    - save() / load() to persist next to the FAISS index
+
+    Truncation only makes sense for embedding models trained to keep the most
+    information in the leading dimensions; PCA works for any model.
+    """
+
+    def __init__(self, dim: int, reduced_dim: int, method: str = "pca"):
+        if method not in REDUCTION_METHODS:
+            raise ValueError(f"Unknown reduction method '{method}'. Use one of: {', '.join(REDUCTION_METHODS)}")
+        if not 0 < reduced_dim <= dim:
+            raise ValueError(f"reduced_dim must be between 1 and {dim}")
+        self.dim = dim
+        self.reduced_dim = reduced_dim
+        self.method = method
+        self.pca: Optional[faiss.PCAMatrix] = None
+        self.index = faiss.IndexFlatIP(reduced_dim)
+
+    @property
+    def is_trained(self) -> bool:
+        return self.method == "truncate" or (self.pca is not None and self.pca.is_trained)
+
+    @property
+    def nbytes(self) -> int:
+        return self.index.ntotal * self.reduced_dim * 4
+
+    def train(self, vectors: np.ndarray):
+        """
+        vectors: normalized sample of the stored vectors, shape (n, dim)
+        """
+        if self.method != "pca":
+            return
+        if len(vectors) < self.reduced_dim:
+            raise ValueError(f"PCA to {self.reduced_dim} dims needs at least {self.reduced_dim} vectors, got {len(vectors)}")
+        self.pca = faiss.PCAMatrix(self.dim, self.reduced_dim)
+        self.pca.train(np.ascontiguousarray(vectors, dtype="float32"))
+
+    def project(self, vectors: np.ndarray) -> np.ndarray:
+        vectors = np.ascontiguousarray(vectors, dtype="float32")
+        if self.method == "pca":
+            reduced = self.pca.apply(vectors)
+        else:
+            reduced = vectors[:, : self.reduced_dim]
+        # Re-normalize so inner product is still a cosine in the reduced space
+        norms = np.linalg.norm(reduced, axis=1, keepdims=True) + 1e-10
+        return np.ascontiguousarray(reduced / norms, dtype="float32")
+
+    def add(self, vectors: np.ndarray):
+        if not self.is_trained:
+            raise ValueError("ReducedIndex.train() must be called before add()")
+        self.index.add(self.project(vectors))
+
+    def search(self, queries: np.ndarray, candidates: int) -> np.ndarray:
+        """
+        queries: normalized, shape (n, dim)
+        returns: candidate ids, shape (n, candidates); missing hits are -1
+        """
+        _, ids = self.index.search(self.project(queries), candidates)
+        return ids
+
+    def save(self, folder: str):
+        os.makedirs(folder, exist_ok=True)
+        faiss.write_index(self.index, os.path.join(folder, "reduced.faiss"))
+        if self.pca is not None:
+            faiss.write_VectorTransform(self.pca, os.path.join(folder, "reduced_pca.bin"))
+        with open(os.path.join(folder, "reduced.json"), "w", encoding="utf-8") as f:
+            json.dump({"dim": self.dim, "reduced_dim": self.reduced_dim, "method": self.method}, f)
+
+    @classmethod
+    def load(cls, folder: str) -> Optional["ReducedIndex"]:
+        """
+        Load an index saved with save(); returns None if the folder has no reduced index.
+        """
+        meta_path = os.path.join(folder, "reduced.json")
+        if not os.path.exists(meta_path):
+            return None
+
+        with open(meta_path, "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        reduced = cls(meta["dim"], meta["reduced_dim"], meta["method"])
+        reduced.index = faiss.read_index(os.path.join(folder, "reduced.faiss"))
+        if reduced.method == "pca":
+            reduced.pca = faiss.read_VectorTransform(os.path.join(folder, "reduced_pca.bin"))
+        return reduced
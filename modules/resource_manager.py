@@ -0,0 +1,200 @@
+import gc
+import time
+import threading
+from typing import Callable, Dict, List, Optional
+
+# Models and indexes register here (see ResourceManager.register); the manager unloads the ones
+# that sat idle for IDLE_UNLOAD_S, and the least recently used ones whenever the total
+# resident size goes over MEMORY_BUDGET_BYTES. Unloaded components reload on their next use.
+MEMORY_BUDGET_BYTES = 8 * 1024 ** 3
+IDLE_UNLOAD_S: Optional[float] = 15 * 60  # None = never unload just for being idle
+CHECK_INTERVAL_S = 30.0
+
+
+class _Component:
+    def __init__(self, name: str, size_fn: Callable[[], int], unload_fn: Optional[Callable[[], None]]):
+        self.name = name
+        self.size_fn = size_fn
+        self.unload_fn = unload_fn
+        self.last_used: Optional[float] = None  # None = not loaded
+        self.loads = 0
+        self.unloads = 0
+
+    @property
+    def loaded(self) -> bool:
+        return self.last_used is not None
+
+    def size(self) -> int:
+        if not self.loaded:
+            return 0
+        try:
+            return int(self.size_fn() or 0)
+        except Exception:
+            return 0
+
+
+class ResourceManager:
+    """
+    Tracks last use and resident size of each heavy component (LLMs, embedder, indexes):
+    - touch() on every use, loaded() right after a (re)load
+    - enforce() unloads idle components, then LRU ones until the budget is met
+    - report() lists resident size, idle time and load/unload counts per component
+    - start() runs enforce() every CHECK_INTERVAL_S in a daemon thread
+
+    Unload functions only drop the module-level reference, so a caller still holding
+    the object finishes its request; memory is freed when the last reference goes.
+    """
+
+    def __init__(self, budget_bytes: int = MEMORY_BUDGET_BYTES, idle_unload_s: Optional[float] = IDLE_UNLOAD_S):
+        self.budget_bytes = budget_bytes
+        self.idle_unload_s = idle_unload_s
+        self._components: Dict[str, _Component] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def register(self, name: str, size_fn: Callable[[], int], unload_fn: Optional[Callable[[], None]] = None):
+        """
+        size_fn: resident bytes of the component while loaded
+        unload_fn: drops it (None = only tracked and reported, never unloaded)
+        """
+        with self._lock:
+            component = self._components.get(name)
+            if component is None:
+                self._components[name] = _Component(name, size_fn, unload_fn)
+            else:  # re-registered (e.g. a store was re-opened): keep stats, use the new functions
+                component.size_fn = size_fn
+                component.unload_fn = unload_fn
+
+    def unregister(self, name: str):
+        with self._lock:
+            self._components.pop(name, None)
+
+    def touch(self, name: str):
+        component = self._components.get(name)
+        if component is not None:
+            component.last_used = time.monotonic()
+
+    def loaded(self, name: str):
+        """
+        Call after a component was (re)loaded: marks it used and makes room for it.
+        """
+        component = self._components.get(name)
+        if component is None:
+            return
+        component.last_used = time.monotonic()
+        component.loads += 1
+        self.enforce(keep=name)
+
+    def enforce(self, keep: Optional[str] = None) -> List[str]:
+        """
+        Unload idle components, then least recently used ones while over budget.
+        `keep` is never unloaded (the component that was just loaded). Returns unloaded names.
+        """
+        now = time.monotonic()
+        with self._lock:
+            candidates = [
+                c for c in self._components.values()
+                if c.loaded and c.unload_fn is not None and c.name != keep
+            ]
+            victims = []
+            if self.idle_unload_s is not None:
+                victims = [c for c in candidates if now - c.last_used >= self.idle_unload_s]
+
+            total = sum(c.size() for c in self._components.values() if c not in victims)
+            for c in sorted(candidates, key=lambda c: c.last_used):
+                if total <= self.budget_bytes:
+                    break
+                if c not in victims:
+                    victims.append(c)
+                    total -= c.size()
+
+            for c in victims:
+                c.last_used = None
+                c.unloads += 1
+
+        # Unload outside our lock: unload functions take the component's own lock,
+        # which may be held by a thread that is waiting to touch() us
+        for c in victims:
+            print(f"💤 Unloading {c.name}")
+            c.unload_fn()
+        if victims:
+            gc.collect()
+        return [c.name for c in victims]
+
+    def report(self) -> List[Dict]:
+        now = time.monotonic()
+        rows = []
+        for c in list(self._components.values()):
+            rows.append({
+                "name": c.name,
+                "loaded": c.loaded,
+                "resident_mb": round(c.size() / 1e6, 1),
+                "idle_s": round(now - c.last_used, 1) if c.loaded else None,
+                "loads": c.loads,
+                "unloads": c.unloads,
+            })
+        return rows
+
+    def total_bytes(self) -> int:
+        return sum(c.size() for c in list(self._components.values()))
+
+    def start(self, interval: float = CHECK_INTERVAL_S):
+        """
+        Check idle time and budget in the background every `interval` seconds.
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+
+        def loop():
+            while not self._stop.wait(interval):
+                self.enforce()
+
+        self._thread = threading.Thread(target=loop, name="resource-manager", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+
+def torch_module_bytes(module) -> int:
+    """
+    Bytes held by a torch module's tensors (0 if it has none, e.g. ONNX).
+
+    Counted from state_dict(): dynamic int8 quantization moves Linear weights into packed
+    params, which are neither parameters nor buffers. Tied weights are counted once.
+    """
+    seen = set()
+    total = 0
+
+    def add(value):
+        nonlocal total
+        if isinstance(value, (tuple, list)):  # packed params come as (weight, bias)
+            for item in value:
+                add(item)
+            return
+        if not hasattr(value, "element_size") or value.numel() == 0:
+            return
+        key = (value.data_ptr(), value.numel())
+        if key in seen:
+            return
+        seen.add(key)
+        total += value.numel() * value.element_size()
+
+    for value in module.state_dict().values():
+        add(value)
+    return total
+
+
+# One manager per process, shared by all model modules
+resource_manager = ResourceManager()
+
+
+def print_resource_report():
+    rows = resource_manager.report()
+    print(f"📦 Resident components ({resource_manager.total_bytes() / 1e6:.0f} MB of "
+          f"{resource_manager.budget_bytes / 1e6:.0f} MB budget):")
+    for row in rows:
+        state = f"{row['resident_mb']:.0f} MB, idle {row['idle_s']:.0f}s" if row["loaded"] else "unloaded"
+        print(f"  - {row['name']:16s} {state} (loads={row['loads']}, unloads={row['unloads']})")
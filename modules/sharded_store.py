@@ -0,0 +1,343 @@
+import os
+import sys
+import time
+import heapq
+import threading
+import multiprocessing as mp
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from multiprocessing.connection import Client, Listener
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# 🔧 Make sure project root (C:\local_ai) is on sys.path (also needed inside spawned shards)
+PROJECT_ROOT = os.path.dirname(os.path.dirname(__file__))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+
+from modules.vector_store import VectorStore, fuse_scores
+
+LATENCY_WINDOW = 1000  # last N searches kept per shard for latency stats
+
+
+# ---------------------------------------------------------------------------
+# Shard server: one VectorStore behind a multiprocessing.connection socket.
+# Messages are pickled tuples: (command, *args) -> (ok, result)
+# Unpickling runs code, so the authkey is the only protection: keep it secret and random.
+# ---------------------------------------------------------------------------
+
+def _handle(store: VectorStore, command: str, args: tuple):
+    if command == "add":
+        embeddings, chunks = args
+        store.add_embeddings(embeddings, chunks)
+        return store.index.ntotal
+    if command == "search":
+        query_embedding, top_k, query_text, mode = args
+        start = time.perf_counter()
+        if mode == "dense":
+            results = store.search(query_embedding, top_k=top_k)
+        else:
+            # Raw (chunk, dense, bm25) candidates; the client fuses them with a global BM25 scale
+            results = store.score_candidates(query_embedding, query_text, mode=mode, candidates=top_k)
+        return results, time.perf_counter() - start
+    if command == "take":
+        # Remove the last n items and hand them back (used for rebalancing)
+        (n,) = args
+        total = store.index.ntotal
+        n = min(n, total)
+        vectors = store.index.reconstruct_n(total - n, n)
+        chunks = store.text_chunks[total - n:]
+        store.index.remove_ids(np.arange(total - n, total, dtype="int64"))
+        del store.text_chunks[total - n:]
+        store.build_lexical_index()
+        return vectors, chunks
+    if command == "count":
+        return store.index.ntotal
+    raise ValueError(f"Unknown shard command '{command}'")
+
+
+def _serve_connection(conn, store: VectorStore, lock: threading.Lock, stop: threading.Event, wake):
+    with conn:
+        while not stop.is_set():
+            try:
+                message = conn.recv()
+            except EOFError:
+                return
+            command, args = message[0], message[1:]
+            if command == "close":
+                stop.set()
+                conn.send((True, None))
+                wake()  # unblock listener.accept() so the server loop can exit
+                return
+            try:
+                with lock:
+                    conn.send((True, _handle(store, command, args)))
+            except Exception as e:
+                conn.send((False, repr(e)))
+
+
+def run_shard_server(dim: int, authkey: bytes, host: str = "127.0.0.1", port: int = 0, ready=None):
+    """
+    Serve one shard until a client sends "close". Can be started by hand on another node;
+    pass a random secret (e.g. os.urandom(32)) as authkey and give the same key to connect().
+    """
+    if not authkey:
+        raise ValueError("run_shard_server needs a secret authkey")
+    store = VectorStore(dim=dim)
+    store.build_lexical_index()
+    lock = threading.Lock()
+    stop = threading.Event()
+
+    with Listener((host, port), authkey=authkey) as listener:
+        if ready is not None:
+            ready.put(listener.address)
+        print(f"🧩 Shard {os.getpid()} listening on {listener.address}")
+
+        def wake():
+            Client(listener.address, authkey=authkey).close()
+
+        while not stop.is_set():
+            conn = listener.accept()
+            if stop.is_set():
+                break
+            threading.Thread(
+                target=_serve_connection,
+                args=(conn, store, lock, stop, wake),
+                daemon=True,
+            ).start()
+
+
+# ---------------------------------------------------------------------------
+# Client side
+# ---------------------------------------------------------------------------
+
+class _ShardClient:
+    def __init__(self, address, authkey: bytes, process=None):
+        self.address = address
+        self.process = process
+        self.conn = Client(address, authkey=authkey)
+        self.lock = threading.Lock()
+        self.count = 0
+        self.latencies = deque(maxlen=LATENCY_WINDOW)       # round trip, seconds
+        self.compute_times = deque(maxlen=LATENCY_WINDOW)   # time spent searching inside the shard
+
+    def call(self, command: str, *args):
+        with self.lock:
+            self.conn.send((command, *args))
+            ok, result = self.conn.recv()
+        if not ok:
+            raise RuntimeError(f"Shard {self.address} failed on '{command}': {result}")
+        return result
+
+
+class ShardedVectorStore:
+    """
+    Vector store split across N shard processes, each holding its own VectorStore.
+    - add_embeddings() spreads chunks so shards stay equally sized
+    - search() fans the query out to all shards in parallel and merges the per-shard top-k
+    - stats() reports size and latency per shard
+
+    Shards talk over multiprocessing.connection sockets, so they can also run on other
+    nodes (start them with run_shard_server and use ShardedVectorStore.connect).
+    Shards started here get a fresh random authkey per store.
+    In hybrid/prefilter modes BM25 statistics are per shard (approximate IDF).
+
+    Only search() is distributed: chunk ids, search_batch(), save() and reduced indexes
+    need one VectorStore: there is no text_chunks / index attribute, and the methods raise TypeError.
+    """
+
+    def __init__(self, dim: int, num_shards: int = 2, authkey: Optional[bytes] = None):
+        self.dim = dim
+        self.authkey = authkey or os.urandom(32)
+        self.shards: List[_ShardClient] = []
+        for _ in range(num_shards):
+            self._spawn_shard()
+        self._pool = ThreadPoolExecutor(max_workers=max(1, num_shards))
+
+    @classmethod
+    def connect(cls, dim: int, addresses: List[Tuple[str, int]], authkey: bytes) -> "ShardedVectorStore":
+        """
+        Use shard servers that are already running (locally or on other nodes),
+        started with the same authkey.
+        """
+        if not authkey:
+            raise ValueError("connect() needs the authkey the shard servers were started with")
+        store = cls(dim, num_shards=0, authkey=authkey)
+        for address in addresses:
+            client = _ShardClient(tuple(address), authkey)
+            client.count = client.call("count")
+            store.shards.append(client)
+        store._pool = ThreadPoolExecutor(max_workers=max(1, len(store.shards)))
+        return store
+
+    def _spawn_shard(self) -> _ShardClient:
+        ctx = mp.get_context("spawn")
+        ready = ctx.Queue()
+        process = ctx.Process(
+            target=run_shard_server,
+            kwargs={"dim": self.dim, "authkey": self.authkey, "ready": ready},
+            daemon=True,
+        )
+        process.start()
+        address = ready.get(timeout=120)
+        client = _ShardClient(address, self.authkey, process=process)
+        self.shards.append(client)
+        return client
+
+    def add_embeddings(self, embeddings: np.ndarray, chunks: List[str]):
+        """
+        Same contract as VectorStore.add_embeddings. New chunks go to the smallest shards
+        first so all shards end up (nearly) the same size.
+        """
+        if embeddings.shape[0] != len(chunks):
+            raise ValueError("Number of embeddings and chunks must match")
+        if not self.shards:
+            raise ValueError("ShardedVectorStore has no shards")
+
+        counts = [s.count for s in self.shards]
+        total = sum(counts) + len(chunks)
+        targets = [total // len(counts) + (1 if i < total % len(counts) else 0) for i in range(len(counts))]
+
+        start = 0
+        for shard, count, target in zip(self.shards, counts, targets):
+            n = min(max(0, target - count), len(chunks) - start)
+            if n:
+                shard.count = shard.call("add", embeddings[start:start + n], chunks[start:start + n])
+                start += n
+        # Leftovers only happen when shards were already unbalanced
+        if start < len(chunks):
+            smallest = min(self.shards, key=lambda s: s.count)
+            smallest.count = smallest.call("add", embeddings[start:], chunks[start:])
+            self.rebalance()
+
+    def build_lexical_index(self):
+        # Shards keep their BM25 index up to date on every add
+        pass
+
+    def add_shard(self):
+        """
+        Start one more local shard and move chunks onto it.
+        """
+        self._spawn_shard()
+        self._pool = ThreadPoolExecutor(max_workers=len(self.shards))
+        self.rebalance()
+
+    def rebalance(self):
+        """
+        Move chunks from the largest to the smallest shards until sizes differ by at most one.
+        """
+        while True:
+            largest = max(self.shards, key=lambda s: s.count)
+            smallest = min(self.shards, key=lambda s: s.count)
+            n = (largest.count - smallest.count) // 2
+            if n <= 0:
+                return
+            print(f"⚖️ Moving {n} chunks from shard {largest.address} to {smallest.address}")
+            vectors, chunks = largest.call("take", n)
+            largest.count -= len(chunks)
+            smallest.count = smallest.call("add", vectors, chunks)
+
+    def _search_shard(self, shard: _ShardClient, query_embedding, top_k, query_text, mode):
+        start = time.perf_counter()
+        results, compute = shard.call("search", query_embedding, top_k, query_text, mode)
+        shard.latencies.append(time.perf_counter() - start)
+        shard.compute_times.append(compute)
+        return results
+
+    def _scatter(self, query_embedding, top_k, query_text, mode) -> list:
+        futures = [
+            self._pool.submit(self._search_shard, shard, query_embedding, top_k, query_text, mode)
+            for shard in self.shards
+            if shard.count > 0
+        ]
+        return [hit for f in futures for hit in f.result()]
+
+    def search(
+        self,
+        query_embedding: np.ndarray,
+        top_k: int = 5,
+        query_text: Optional[str] = None,
+        mode: str = "dense",
+        alpha: float = 0.5,
+        candidates: int = 50,
+    ) -> List[Tuple[str, float]]:
+        """
+        Scatter the query to every shard, gather each shard's top-k, return the global top-k.
+        Same arguments as VectorStore.search.
+        """
+        if mode != "dense":
+            hits = self._scatter(query_embedding, candidates, query_text, mode)
+            if hits:
+                return fuse_scores(hits, top_k=top_k, alpha=alpha)
+
+        merged = self._scatter(query_embedding, top_k, None, "dense")
+        return heapq.nlargest(top_k, merged, key=lambda hit: hit[1])
+
+    # Chunks and vectors live in the shard processes, so there is no text_chunks / index here
+    def _single_store_only(self, what: str):
+        raise TypeError(f"{what} needs a single-process VectorStore; build the index with num_shards=1")
+
+    def search_batch(self, query_embeddings: np.ndarray, top_k: int = 5):
+        self._single_store_only("search_batch()")
+
+    def save(self, folder: str):
+        self._single_store_only("save()")
+
+    def build_reduced_index(self, *args, **kwargs):
+        self._single_store_only("build_reduced_index()")
+
+    def stats(self) -> List[Dict[str, float]]:
+        """
+        Per-shard size and search latency (round trip and in-shard compute), in milliseconds.
+        """
+        report = []
+        for shard in self.shards:
+            lat = np.array(shard.latencies) * 1000
+            comp = np.array(shard.compute_times) * 1000
+            report.append({
+                "address": shard.address,
+                "chunks": shard.count,
+                "searches": len(lat),
+                "p50_ms": float(np.percentile(lat, 50)) if len(lat) else 0.0,
+                "p95_ms": float(np.percentile(lat, 95)) if len(lat) else 0.0,
+                "mean_compute_ms": float(comp.mean()) if len(comp) else 0.0,
+            })
+        return report
+
+    def close(self):
+        """
+        Stop the shard processes this store started (connected remote shards are left running).
+        """
+        for shard in self.shards:
+            if shard.process is not None:
+                try:
+                    shard.call("close")
+                except (EOFError, OSError):
+                    pass
+                shard.process.join(timeout=5)
+            shard.conn.close()
+        self.shards = []
+        self._pool.shutdown(wait=False)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+if __name__ == "__main__":
+    rng = np.random.default_rng(0)
+    dim = 32
+    emb = rng.normal(size=(1000, dim)).astype("float32")
+    texts = [f"chunk {i}" for i in range(len(emb))]
+
+    with ShardedVectorStore(dim=dim, num_shards=3) as store:
+        store.add_embeddings(emb, texts)
+        store.add_shard()
+        for _ in range(50):
+            store.search(rng.normal(size=dim).astype("float32"), top_k=5)
+        print("Results:", store.search(emb[42], top_k=3))
+        for row in store.stats():
+            print(row)
@@ -0,0 +1,107 @@
+import os
+import sys
+import time
+from typing import Dict, List
+
+# 🔧 Ensure project root (C:\local_ai) is on sys.path
+PROJECT_ROOT = os.path.dirname(os.path.dirname(__file__))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+
+from modules.embedder import embed_texts
+from modules.multi_rag_gguf import build_vector_store_from_folder_gguf, build_rag_prompt_gguf
+from modules import local_llm_gguf
+
+
+class CountingDraft:
+    """
+    Wraps a llama-cpp draft model and counts how often it is called and how many tokens it proposes.
+    """
+
+    def __init__(self, draft_model):
+        self.draft_model = draft_model
+        self.calls = 0
+        self.drafted = 0
+
+    def __call__(self, input_ids, /, **kwargs):
+        draft = self.draft_model(input_ids, **kwargs)
+        self.calls += 1
+        self.drafted += len(draft)
+        return draft
+
+
+def benchmark_mode(prompts: List[str], mode: str, max_tokens: int = 256) -> Dict[str, float]:
+    """
+    Answer every prompt with one speculative mode and return tokens/s and acceptance rate.
+
+    Every verification step emits the accepted draft tokens plus one token from the main
+    model, so accepted ≈ generated - draft calls.
+    """
+    draft = local_llm_gguf.create_draft_model(mode)
+    counter = CountingDraft(draft) if draft is not None else None
+    llm = local_llm_gguf.create_llm(mode, draft_model=counter)
+
+    generated = 0
+    elapsed = 0.0
+    for prompt in prompts:
+        start = time.perf_counter()
+        resp = llm.create_chat_completion(
+            messages=[
+                {"role": "system", "content": "You are a helpful, concise assistant."},
+                {"role": "user", "content": prompt},
+            ],
+            max_tokens=max_tokens,
+            temperature=0.0,  # greedy so every mode produces the same answer
+        )
+        elapsed += time.perf_counter() - start
+        generated += resp["usage"]["completion_tokens"]
+
+    stats = {"tokens": generated, "seconds": elapsed, "tokens_per_s": generated / elapsed if elapsed else 0.0}
+    if counter is not None and counter.drafted:
+        accepted = max(0, generated - counter.calls)
+        stats["acceptance_rate"] = accepted / counter.drafted
+    del llm
+    return stats
+
+
+def benchmark_speculative(
+    folder_path: str,
+    questions: List[str],
+    modes: List[str] = ("off", "prompt_lookup"),
+    top_k: int = 5,
+) -> Dict[str, Dict[str, float]]:
+    """
+    Build RAG prompts from the PDFs in `folder_path` and compare decoding modes on them.
+    """
+    store, _ = build_vector_store_from_folder_gguf(folder_path)
+    q_embs = embed_texts(questions)
+    prompts = [build_rag_prompt_gguf(store, q, q_vec, top_k=top_k) for q, q_vec in zip(questions, q_embs)]
+
+    results = {}
+    for mode in modes:
+        print(f"⏱️ Benchmarking speculative mode: {mode}")
+        results[mode] = benchmark_mode(prompts, mode)
+
+    base = results.get("off", {}).get("tokens_per_s")
+    print("\n📊 Speculative decoding on RAG prompts:")
+    for mode, stats in results.items():
+        line = f"  - {mode:14s} {stats['tokens_per_s']:.1f} tok/s"
+        if base:
+            line += f" ({stats['tokens_per_s'] / base:.2f}x)"
+        if "acceptance_rate" in stats:
+            line += f", acceptance={stats['acceptance_rate']:.0%}"
+        print(line)
+    return results
+
+
+if __name__ == "__main__":
+    folder = r"C:\local_ai\data"
+    questions = [
+        "What is the main topic across these documents?",
+        "Summarize the key definitions mentioned in the documents.",
+        "Which requirements or steps are listed?",
+    ]
+    modes = ["off", "prompt_lookup"]
+    if os.path.exists(local_llm_gguf.DRAFT_MODEL_PATH):
+        modes.append("draft_model")
+    benchmark_speculative(folder, questions, modes=modes)
@@ -1,13 +1,47 @@
-from typing import List, Tuple
+import os
+import sys
+import json
+from typing import List, Optional, Tuple
 import faiss
 import numpy as np
 
+# 🔧 Make sure project root (C:\local_ai) is on sys.path
+PROJECT_ROOT = os.path.dirname(os.path.dirname(__file__))
+if PROJECT_ROOT not in sys.path:
+    sys.path.append(PROJECT_ROOT)
+
+from modules.bm25_index import BM25Index
+from modules.reduced_index import ReducedIndex
+
+SEARCH_MODES = ("dense", "hybrid", "prefilter")
+REDUCED_DIM = 128        # dims kept by build_reduced_index() (embeddings have 384)
+RERANK_CANDIDATES = 100  # first-pass hits re-scored with the full vectors
+
+
+def fuse_scores(
+    hits: List[Tuple[str, float, float]],
+    top_k: int = 5,
+    alpha: float = 0.5,
+) -> List[Tuple[str, float]]:
+    """
+    hits: list of (chunk_text, dense_cosine, bm25_score)
+    BM25 is scaled by its max over the hits, then fused = alpha * dense + (1 - alpha) * bm25.
+    returns: top-k list of (chunk_text, fused_score)
+    """
+    max_lex = max(h[2] for h in hits) or 1.0
+    fused = [(chunk, alpha * dense + (1.0 - alpha) * lex / max_lex) for chunk, dense, lex in hits]
+    fused.sort(key=lambda hit: hit[1], reverse=True)
+    return fused[:top_k]
+
 
 class VectorStore:
     """
     Simple FAISS-based vector store for RAG:
     - add_embeddings() to store vectors + texts
     - search() to retrieve top-k similar chunks
+    - build_lexical_index() to add a BM25 index over the same chunks (hybrid search)
+    - build_reduced_index() for two-stage dense search (reduced-dim scan, full-dim re-rank)
+    - save() / load() to persist everything in one folder
     """
 
     def __init__(self, dim: int):
@@ -15,6 +49,9 @@ class VectorStore:
         # Cosine similarity via inner product on normalized vectors
         self.index = faiss.IndexFlatIP(dim)
         self.text_chunks: List[str] = []
+        self.lexical_index: Optional[BM25Index] = None
+        self.reduced_index: Optional[ReducedIndex] = None
+        self.rerank_candidates = RERANK_CANDIDATES
 
     def add_embeddings(self, embeddings: np.ndarray, chunks: List[str]):
         """
@@ -30,12 +67,82 @@ class VectorStore:
 
         self.index.add(normalized.astype("float32"))
         self.text_chunks.extend(chunks)
+        if self.lexical_index is not None:
+            self.lexical_index.add_documents(chunks)
+        if self.reduced_index is not None:
+            # Projection stays fixed; rebuild after large additions to refit PCA
+            self.reduced_index.add(normalized)
+
+    def build_lexical_index(self):
+        """
+        Build a BM25 inverted index over the chunks already in the store.
+        Chunks added later are indexed automatically.
+        """
+        self.lexical_index = BM25Index()
+        self.lexical_index.add_documents(self.text_chunks)
+
+    def build_reduced_index(self, reduced_dim: int = REDUCED_DIM, method: str = "pca", candidates: int = RERANK_CANDIDATES):
+        """
+        Fit a reduced-dimension copy of the stored vectors (PCA or truncation).
+        Dense search then scans the reduced vectors and re-ranks the best `candidates`
+        with the full vectors. Chunks added later are projected automatically.
+        """
+        vectors = self.index.reconstruct_n(0, self.index.ntotal)
+        reduced = ReducedIndex(self.dim, reduced_dim, method)
+        reduced.train(vectors)
+        reduced.add(vectors)
+        self.reduced_index = reduced
+        self.rerank_candidates = candidates
+
+    def _dense_scores(self, q: np.ndarray, ids: np.ndarray) -> np.ndarray:
+        """
+        Exact cosine scores of the query against a subset of stored vectors.
+        """
+        vectors = self.index.reconstruct_batch(ids.astype("int64"))
+        return vectors @ q[0]
 
-    def search(self, query_embedding: np.ndarray, top_k: int = 5) -> List[Tuple[str, float]]:
+    def _search_ids(self, q: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Dense top-k for normalized queries q (n, dim), like index.search().
+        With a reduced index: first pass on reduced vectors, exact re-rank with full vectors.
+        """
+        if self.reduced_index is None:
+            return self.index.search(q, k)
+
+        cand = self.reduced_index.search(q, max(k, self.rerank_candidates))
+        valid = cand != -1
+        full = self.index.reconstruct_batch(np.where(valid, cand, 0).ravel().astype("int64"))
+        scores = np.einsum("ncd,nd->nc", full.reshape(*cand.shape, self.dim), q)
+        scores[~valid] = -np.inf
+
+        k = min(k, cand.shape[1])
+        best = np.argsort(-scores, axis=1)[:, :k]
+        ids = np.take_along_axis(cand, best, axis=1)
+        scores = np.take_along_axis(scores, best, axis=1).astype("float32")
+        scores[ids == -1] = -3.4028235e38  # same filler as faiss for missing hits
+        return scores, ids
+
+    def search(
+        self,
+        query_embedding: np.ndarray,
+        top_k: int = 5,
+        query_text: Optional[str] = None,
+        mode: str = "dense",
+        alpha: float = 0.5,
+        candidates: int = 50,
+    ) -> List[Tuple[str, float]]:
         """
         query_embedding: shape (dim,)
+        mode:
+          - "dense"     : FAISS only (default)
+          - "hybrid"    : union of dense and BM25 candidates, fused score
+          - "prefilter" : BM25 picks `candidates` chunks, dense scoring only on those
+        alpha: weight of the dense score in the fused score (1 - alpha for BM25)
         returns: list of (chunk_text, score)
         """
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"Unknown search mode '{mode}'. Use one of: {', '.join(SEARCH_MODES)}")
+
         if self.index.ntotal == 0:
             return []
 
@@ -43,7 +150,65 @@ class VectorStore:
         q = query_embedding / (np.linalg.norm(query_embedding) + 1e-10)
         q = q.astype("float32").reshape(1, -1)
 
-        scores, indices = self.index.search(q, top_k)
+        if mode == "dense":
+            return self._search_dense(q, top_k)
+
+        hits = self.score_candidates(query_embedding, query_text, mode=mode, candidates=candidates)
+        if not hits:
+            # No exact term matched: nothing to fuse with
+            return self._search_dense(q, top_k)
+        return fuse_scores(hits, top_k=top_k, alpha=alpha)
+
+    def score_candidates(
+        self,
+        query_embedding: np.ndarray,
+        query_text: Optional[str],
+        mode: str = "hybrid",
+        candidates: int = 50,
+    ) -> List[Tuple[str, float, float]]:
+        """
+        Candidate chunks for hybrid/prefilter search with their raw scores.
+        returns: list of (chunk_text, dense_cosine, bm25_score); empty if no query term matched
+        """
+        if self.lexical_index is None or not query_text:
+            raise ValueError(f"Search mode '{mode}' needs build_lexical_index() and query_text")
+
+        lex_ids, lex_scores = self.lexical_index.score(query_text)
+        if len(lex_ids) == 0:
+            return []
+
+        if len(lex_ids) > candidates:
+            keep = np.argpartition(-lex_scores, candidates - 1)[:candidates]
+            lex_ids, lex_scores = lex_ids[keep], lex_scores[keep]
+        lexical = dict(zip(lex_ids.tolist(), lex_scores.tolist()))
+
+        q = query_embedding / (np.linalg.norm(query_embedding) + 1e-10)
+        q = q.astype("float32").reshape(1, -1)
+
+        ids = set(lexical)
+        if mode == "hybrid":
+            _, dense_ids = self._search_ids(q, candidates)
+            ids.update(int(i) for i in dense_ids[0] if i != -1)
+
+        ids = np.fromiter(ids, dtype="int64")
+        dense = self._dense_scores(q, ids)
+        return [
+            (self.text_chunks[i], float(d), lexical.get(int(i), 0.0))
+            for i, d in zip(ids, dense)
+        ]
+
+    def search_batch(self, query_embeddings: np.ndarray, top_k: int = 5) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Dense search for many queries in one FAISS call.
+        query_embeddings: shape (n, dim)
+        returns: (scores, chunk_ids), both shape (n, top_k); missing hits have id -1
+        """
+        norms = np.linalg.norm(query_embeddings, axis=1, keepdims=True) + 1e-10
+        q = (query_embeddings / norms).astype("float32")
+        return self._search_ids(q, top_k)
+
+    def _search_dense(self, q: np.ndarray, top_k: int) -> List[Tuple[str, float]]:
+        scores, indices = self._search_ids(q, top_k)
         results: List[Tuple[str, float]] = []
 
         for idx, score in zip(indices[0], scores[0]):
@@ -54,6 +219,36 @@ class VectorStore:
 
         return results
 
+    def save(self, folder: str):
+        """
+        Write the FAISS index, the chunks and (if built) the BM25 and reduced indexes into `folder`.
+        """
+        os.makedirs(folder, exist_ok=True)
+        faiss.write_index(self.index, os.path.join(folder, "index.faiss"))
+        with open(os.path.join(folder, "chunks.json"), "w", encoding="utf-8") as f:
+            json.dump(self.text_chunks, f, ensure_ascii=False)
+        if self.lexical_index is not None:
+            self.lexical_index.save(folder)
+        if self.reduced_index is not None:
+            self.reduced_index.save(folder)
+        print(f"💾 Vector store saved to {folder}")
+
+    @classmethod
+    def load(cls, folder: str) -> "VectorStore":
+        index_path = os.path.join(folder, "index.faiss")
+        if not os.path.exists(index_path):
+            raise FileNotFoundError(f"No saved vector store in {folder}")
+
+        index = faiss.read_index(index_path)
+        store = cls(dim=index.d)
+        store.index = index
+        with open(os.path.join(folder, "chunks.json"), "r", encoding="utf-8") as f:
+            store.text_chunks = json.load(f)
+        store.lexical_index = BM25Index.load(folder)
+        store.reduced_index = ReducedIndex.load(folder)
+        print(f"📂 Vector store loaded from {folder} ({index.ntotal} chunks)")
+        return store
+
 
 if __name__ == "__main__":
     # Tiny test of the vector store
@@ -75,3 +270,7 @@ if __name__ == "__main__":
     query = np.array([0.6, 0.8, 0, 0], dtype="float32")
     results = store.search(query, top_k=2)
     print("Results:", results)
+
+    store.build_lexical_index()
+    results = store.search(query, top_k=2, query_text="chunk A", mode="hybrid")
+    print("Hybrid results:", results)